@@ -0,0 +1,237 @@
+# bench_parsing.py
+"""
+Micro-benchmarks voor de CPU-paden buiten de browser, met bevroren klok:
+- slot_parser.collect_open_slots (split, strptime per slot, weekdagfilter, sort)
+- slot_parser.days_from_html (replay van snapshots)
+- config: business_days_from_today, is_within_n_business_days,
+  get_next_monday_if_weekend, Config.get_tomorrow_week_monday_str
+
+Tabellen: synthetisch (lege week → volledig open week) en optioneel opgenomen
+snapshots (--snapshots DIR, zie snapshots.py).
+
+Per case: tijd per call (beste van --repeat) en piekgeheugen per call (tracemalloc).
+Elke reeks wordt afgewisseld met een vaste calibratie-workload; de mediaan van die
+verhoudingen ('rel') is wat de regressiecheck vergelijkt, zodat machineverschillen en
+schommelende CPU-snelheid grotendeels wegvallen. Vergelijkt met bench_baseline.json en
+eindigt met exitcode 1 bij regressie.
+
+    python bench_parsing.py                    # meten + vergelijken
+    python bench_parsing.py --update-baseline  # baseline (her)schrijven op deze machine
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from config import (
+    Config,
+    business_days_from_today,
+    get_next_monday_if_weekend,
+    is_within_n_business_days,
+)
+from slot_parser import Day, collect_open_slots, days_from_html
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# Woensdag 10u: venster van 3 werkdagen loopt over het weekend heen
+FROZEN_NOW = datetime(2026, 3, 4, 10, 0)
+DAY_NAMES = ["ma", "di", "wo", "do", "vr", "za", "zo"]
+ALL_TIMES = [f"{h:02d}:{m:02d}" for h in range(7, 17) for m in (0, 30)]  # 20 per dag
+
+
+# ---------------- Synthetische tabellen ----------------
+def synthetic_week(monday: datetime, per_day: int) -> List[Day]:
+    """7 dagen vanaf 'monday' met de eerste 'per_day' tijden open."""
+    days = []
+    for i in range(7):
+        d = monday + timedelta(days=i)
+        days.append((f"{DAY_NAMES[i]} {d:%d/%m}", d.strftime("%d/%m/%Y"), ALL_TIMES[:per_day]))
+    return days
+
+
+def render_html(days: List[Day]) -> str:
+    """Slottabel-HTML zoals de AIBV-pagina ze rendert (RadioButtonList per dag)."""
+    rows = []
+    for i, (label, full_date, times) in enumerate(days, 1):
+        radios = "".join(
+            f'<tr><td><input id="MainContent_rblTijdstip{i}_{j}" type="radio" '
+            f'name="ctl00$MainContent$rblTijdstip{i}" value="{t}" />'
+            f'<label for="MainContent_rblTijdstip{i}_{j}">{t}</label></td></tr>'
+            for j, t in enumerate(times)
+        )
+        rows.append(
+            f'<td><span id="MainContent_LabelDatum{i}">{label}</span>'
+            f'<table id="MainContent_rblTijdstip{i}" title="{full_date}">{radios}</table></td>'
+        )
+    return f'<table class="slots"><tr>{"".join(rows)}</tr></table>'
+
+
+def recorded_tables(snapshot_dir: str, limit: int = 20) -> List[Tuple[str, str]]:
+    from snapshots import SnapshotRecorder, KIND_SLOTS
+
+    rec = SnapshotRecorder(snapshot_dir)
+    out, seen = [], set()
+    for e in reversed(rec.entries(kind=KIND_SLOTS)):
+        if e["hash"] in seen:
+            continue
+        seen.add(e["hash"])
+        try:
+            out.append((f"recorded_{e['hash'][:8]}", rec.load_html(e["hash"])))
+        except FileNotFoundError:
+            continue
+        if len(out) >= limit:
+            break
+    return out
+
+
+# ---------------- Meten ----------------
+def _calibration():
+    # vaste mix van string-, datetime- en lijstwerk, vergelijkbaar met de gemeten paden
+    parts = "ma 02/03 vr 06/03".split()
+    d = FROZEN_NOW
+    for _ in range(20):
+        d += timedelta(days=1)
+        parts.append(d.strftime("%d/%m/%Y"))
+    parts.sort()
+    return parts
+
+
+def _calls_for(fn: Callable[[], object], min_time: float) -> int:
+    """Aantal calls zodat één reeks >= min_time duurt."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_time:
+            return number
+        number *= 2
+
+
+def _per_call(fn: Callable[[], object], number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - t0) / number
+
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float = 0.05) -> Dict[str, float]:
+    number = _calls_for(fn, min_time)
+    calib_number = _calls_for(_calibration, min_time)
+
+    best = float("inf")
+    ratios = []
+    for _ in range(repeat):
+        calib = _per_call(_calibration, calib_number)
+        t = _per_call(fn, number)
+        best = min(best, t)
+        ratios.append(t / calib)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return {
+        "ns_per_call": round(best * 1e9, 1),
+        "rel": round(statistics.median(ratios), 4),
+        "peak_bytes": max(0, peak),
+    }
+
+
+def build_cases(snapshot_dir: str = "") -> Dict[str, Callable[[], object]]:
+    monday = FROZEN_NOW - timedelta(days=FROZEN_NOW.weekday())
+    cases: Dict[str, Callable[[], object]] = {}
+
+    for name, per_day in (("empty_week", 0), ("sparse_week", 2), ("half_open_week", 10), ("full_week", 20)):
+        days = synthetic_week(monday, per_day)
+        html = render_html(days)
+        cases[f"collect/{name}"] = lambda d=days: collect_open_slots(d, FROZEN_NOW)
+        cases[f"html/{name}"] = lambda h=html: days_from_html(h)
+
+    if snapshot_dir:
+        for name, html in recorded_tables(snapshot_dir):
+            days = days_from_html(html)
+            cases[f"collect/{name}"] = lambda d=days: collect_open_slots(d, FROZEN_NOW)
+            cases[f"html/{name}"] = lambda h=html: days_from_html(h)
+
+    friday = FROZEN_NOW + timedelta(days=2)
+    saturday = FROZEN_NOW + timedelta(days=3)
+    slot_dt = FROZEN_NOW + timedelta(days=5)
+    cases["config/business_days_from_today(3)"] = lambda: business_days_from_today(3, FROZEN_NOW)
+    cases["config/business_days_from_today(3)@vr"] = lambda: business_days_from_today(3, friday)
+    cases["config/is_within_n_business_days"] = lambda: is_within_n_business_days(slot_dt, 3, FROZEN_NOW)
+    cases["config/get_next_monday_if_weekend@wo"] = lambda: get_next_monday_if_weekend(FROZEN_NOW)
+    cases["config/get_next_monday_if_weekend@za"] = lambda: get_next_monday_if_weekend(saturday)
+    cases["config/get_tomorrow_week_monday_str"] = lambda: Config.get_tomorrow_week_monday_str(FROZEN_NOW)
+    return cases
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if r["rel"] > b["rel"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: tijd {r['rel']:.3f}x calibratie > baseline {b['rel']:.3f}x "
+                f"({r['ns_per_call']:.0f}ns vs {b['ns_per_call']:.0f}ns)"
+            )
+        # kleine absolute marge: tracemalloc-ruis op kleine allocaties
+        if r["peak_bytes"] > b["peak_bytes"] * (1 + tolerance) + 512:
+            regressions.append(f"{name}: geheugen {r['peak_bytes']}B > baseline {b['peak_bytes']}B")
+    return regressions
+
+
+def _main():
+    ap = argparse.ArgumentParser(description="Parser-/datumlogica micro-benchmarks")
+    ap.add_argument("--repeat", type=int, default=9)
+    ap.add_argument("--tolerance", type=float, default=0.30, help="toegestane vertraging (0.30 = +30%%)")
+    ap.add_argument("--snapshots", default="", help="map van snapshots.py met opgenomen slottabellen")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--filter", default="", help="alleen cases die deze tekst bevatten")
+    args = ap.parse_args()
+
+    # sanity: resultaten met bevroren klok zijn deterministisch
+    full = collect_open_slots(synthetic_week(FROZEN_NOW - timedelta(days=2), 20), FROZEN_NOW)
+    assert full and all(dt > FROZEN_NOW for dt, _ in full), "bevroren klok werkt niet"
+
+    results = {}
+    for name, fn in build_cases(args.snapshots).items():
+        if args.filter and args.filter not in name:
+            continue
+        r = results[name] = measure(fn, args.repeat)
+        print(f"{name:<45} {r['ns_per_call'] / 1000:>10.2f} µs/call  {r['rel']:>8.3f}x  "
+              f"{r['peak_bytes']:>8} B piek")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline geschreven: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("Geen baseline gevonden; draai met --update-baseline.")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Regressies t.o.v. baseline:")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+    print("\n✅ Geen regressies t.o.v. baseline.")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,555 @@
+# cdp_backend.py
+"""
+CDP-direct driver: praat met Chrome over één persistente DevTools-websocket,
+zonder chromedriver ertussen.
+
+CDPDriver biedt het stuk van de Selenium WebDriver-API dat AIBVMonitorBot gebruikt
+(get/refresh/execute_script/find_element(s)/current_url/...), zodat WebDriverWait,
+expected_conditions en Select gewoon blijven werken. Elementen zijn Runtime-objectIds.
+Zoals chromedriver wacht elk commando eerst een lopende navigatie van het hoofdframe
+af, en wacht click() kort op een navigatie die de klik zelf start (bv. AutoPostBack).
+
+Activeren: DRIVER_BACKEND=cdp. Vergelijken met Selenium:
+    python cdp_backend.py --compare 200
+"""
+import os
+import sys
+import json
+import time
+import select
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import websocket  # websocket-client (ook een dependency van selenium)
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+
+from config import Config
+
+log = logging.getLogger("AIBV_CDP")
+
+OBJECT_GROUP = "aibv"
+NAV_GRACE_SEC = 0.3  # zo lang wacht click() op het starten van een navigatie
+
+# Fouten die betekenen: pagina navigeert → even wachten en opnieuw (zoals chromedriver doet)
+_NAVIGATING = (
+    "Execution context was destroyed",
+    "Cannot find default execution context",
+    "Inspected target navigated or closed",
+)
+# Fouten die betekenen: objectId hoort bij een vorige pagina
+_STALE = (
+    "Could not find object with given id",
+    "Cannot find context with specified id",
+)
+
+# Zoekt elementen voor elke By-strategie; 'root' is document of een element
+_FIND_JS = """
+function(by, v, root) {
+    root = root || document;
+    if (by === 'id') {
+        if (root === document) { const e = document.getElementById(v); return e ? [e] : []; }
+        return Array.from(root.querySelectorAll('#' + CSS.escape(v)));
+    }
+    if (by === 'xpath') {
+        const r = document.evaluate(v, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const out = [];
+        for (let i = 0; i < r.snapshotLength; i++) out.push(r.snapshotItem(i));
+        return out;
+    }
+    if (by === 'tag name') return Array.from(root.getElementsByTagName(v));
+    if (by === 'name') return Array.from(root.querySelectorAll('[name="' + CSS.escape(v) + '"]'));
+    if (by === 'class name') return Array.from(root.querySelectorAll('.' + CSS.escape(v)));
+    return Array.from(root.querySelectorAll(v));  // css selector
+}
+"""
+
+
+class CDPError(WebDriverException):
+    pass
+
+
+# ---------------- Elementen ----------------
+class CDPElement:
+    """WebElement-achtige wrapper rond een Runtime-objectId."""
+    def __init__(self, driver: "CDPDriver", object_id: str):
+        self._driver = driver
+        self._object_id = object_id
+
+    def _call(self, fn: str, *args, by_value: bool = True):
+        return self._driver._call_on(self._object_id, fn, list(args), by_value=by_value)
+
+    @property
+    def id(self) -> str:
+        return self._object_id
+
+    @property
+    def text(self) -> str:
+        return self._call("function(){ return this.innerText || ''; }")
+
+    @property
+    def tag_name(self) -> str:
+        return self._call("function(){ return this.tagName.toLowerCase(); }")
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        # Selenium-semantiek: property indien aanwezig, anders het HTML-attribuut
+        return self._call("""
+            function(n) {
+                const p = this[n];
+                if (typeof p === 'boolean') return p ? 'true' : null;
+                if (p !== undefined && p !== null && typeof p !== 'object' && typeof p !== 'function')
+                    return String(p);
+                return this.getAttribute(n);
+            }""", name)
+
+    def get_dom_attribute(self, name: str) -> Optional[str]:
+        return self._call("function(n){ return this.getAttribute(n); }", name)
+
+    def get_property(self, name: str):
+        return self._call("function(n){ return this[n]; }", name)
+
+    def is_displayed(self) -> bool:
+        return bool(self._call("""
+            function() {
+                const s = getComputedStyle(this);
+                return s.visibility !== 'hidden' && s.display !== 'none'
+                    && !!(this.offsetWidth || this.offsetHeight || this.getClientRects().length);
+            }"""))
+
+    def is_enabled(self) -> bool:
+        return bool(self._call("function(){ return !this.disabled; }"))
+
+    def is_selected(self) -> bool:
+        return bool(self._call("function(){ return !!(this.selected || this.checked); }"))
+
+    def click(self):
+        # <option>.click() wijzigt de selectie niet en vuurt geen 'change': zoals het
+        # click-atom van chromedriver zelf selecteren en 'change' op de <select> vuren
+        self._call("""
+            function() {
+                if (this.tagName === 'OPTION') {
+                    const sel = this.closest('select');
+                    if (!sel || sel.disabled || this.disabled) return;
+                    const want = sel.multiple ? !this.selected : true;
+                    if (this.selected === want) return;
+                    this.selected = want;
+                    sel.dispatchEvent(new Event('input', {bubbles:true}));
+                    sel.dispatchEvent(new Event('change', {bubbles:true}));
+                    return;
+                }
+                this.scrollIntoView({block:'center'});
+                this.click();
+            }""")
+        self._driver._wait_pending_navigation(grace=NAV_GRACE_SEC)
+
+    def clear(self):
+        self._call("""
+            function() {
+                this.value = '';
+                this.dispatchEvent(new Event('input', {bubbles:true}));
+                this.dispatchEvent(new Event('change', {bubbles:true}));
+            }""")
+
+    def send_keys(self, value: str):
+        self._call("function(){ this.focus(); }")
+        self._driver._send("Input.insertText", {"text": str(value)})
+
+    def find_element(self, by: str = By.ID, value: Optional[str] = None) -> "CDPElement":
+        return self._driver._find(by, value, root=self._object_id)[0]
+
+    def find_elements(self, by: str = By.ID, value: Optional[str] = None) -> List["CDPElement"]:
+        return self._driver._find(by, value, root=self._object_id, multiple=True)
+
+
+# ---------------- Driver ----------------
+class CDPDriver:
+    def __init__(self, ws_url: str, process: Optional[subprocess.Popen] = None,
+                 user_data_dir: Optional[str] = None):
+        self._ws = websocket.create_connection(ws_url, timeout=30, suppress_origin=True)
+        self._lock = threading.RLock()
+        self._msg_id = 0
+        self._event_seq = 0
+        self._events: Deque[Tuple[int, str, Dict]] = deque(maxlen=1000)
+        self._page_load_timeout = 60.0
+        self._user_data_dir = user_data_dir
+        self.process = process
+        # zelfde vorm als Selenium: watchdog.kill_browser() gebruikt driver.service.process
+        self.service = SimpleNamespace(process=process)
+        self.switch_to = SimpleNamespace(window=lambda handle: None)
+        self.command_stats: Dict[str, List[float]] = {}  # method -> [aantal, totale sec]
+        self._loading = False  # hoofdframe is aan het navigeren/laden
+
+        for domain in ("Page", "Runtime", "Network"):
+            self._send(f"{domain}.enable")
+        self._send("Page.setLifecycleEventsEnabled", {"enabled": True})
+        self._main_frame = self._send("Page.getFrameTree")["frameTree"]["frame"]["id"]
+
+    # ---- opstarten ----
+    @classmethod
+    def launch(cls) -> "CDPDriver":
+        chrome_bin = (
+            os.environ.get("GOOGLE_CHROME_BIN") or os.environ.get("CHROME_BIN")
+            or shutil.which("google-chrome") or shutil.which("chromium")
+            or shutil.which("chromium-browser")
+        )
+        if not chrome_bin:
+            raise RuntimeError("Geen Chrome gevonden (GOOGLE_CHROME_BIN/CHROME_BIN).")
+
+        user_data_dir = tempfile.mkdtemp(prefix="aibv-cdp-")
+        args = [
+            chrome_bin,
+            "--remote-debugging-port=0",
+            f"--user-data-dir={user_data_dir}",
+            "--window-size=1366,900",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-gpu",
+            "--disable-features=VizDisplayCompositor",
+            "--disable-renderer-backgrounding",
+            "--disable-background-timer-throttling",
+            "--password-store=basic",
+        ]
+        if not Config.TEST_MODE:
+            args.append("--headless=new")
+        args.append("about:blank")
+        proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chrome schrijft de gekozen poort naar DevToolsActivePort
+        port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+        end = time.time() + 30
+        port = None
+        while time.time() < end and port is None:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Chrome stopte meteen (exit {proc.returncode}).")
+            try:
+                with open(port_file) as f:
+                    port = int(f.readline().strip())
+            except (FileNotFoundError, ValueError):
+                time.sleep(0.1)
+        if port is None:
+            proc.kill()
+            raise RuntimeError("Chrome DevTools-poort niet gevonden binnen 30s.")
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list", timeout=10) as r:
+            pages = [t for t in json.load(r) if t.get("type") == "page"]
+        if not pages:
+            proc.kill()
+            raise RuntimeError("Geen DevTools-pagina gevonden.")
+        return cls(pages[0]["webSocketDebuggerUrl"], proc, user_data_dir)
+
+    # ---- protocol ----
+    def _recv(self, timeout: float) -> Dict:
+        self._ws.settimeout(max(0.05, timeout))
+        try:
+            return json.loads(self._ws.recv())
+        except websocket.WebSocketTimeoutException:
+            raise TimeoutException("Geen antwoord van Chrome (DevTools).")
+        except (websocket.WebSocketConnectionClosedException, OSError) as e:
+            raise CDPError(f"DevTools-verbinding verbroken: {e}")
+
+    def _dispatch(self, msg: Dict):
+        if "method" in msg:
+            method, params = msg["method"], msg.get("params", {})
+            self._event_seq += 1
+            self._events.append((self._event_seq, method, params))
+            if method == "Page.frameStartedLoading":
+                if params.get("frameId") == self._main_frame:
+                    self._loading = True
+            elif method == "Page.frameStoppedLoading":
+                if params.get("frameId") == self._main_frame:
+                    self._loading = False
+            elif method == "Page.loadEventFired":
+                self._loading = False
+
+    def _pump(self):
+        """Verwerk events die al binnen zijn, zonder te blokkeren."""
+        sock = self._ws.sock
+        while sock is not None and select.select([sock], [], [], 0)[0]:
+            self._dispatch(self._recv(1.0))
+
+    def _wait_pending_navigation(self, grace: float = 0.0):
+        """
+        Wacht een navigatie van het hoofdframe af (zoals chromedriver vóór/na commando's).
+        'grace': wacht eerst zo lang op een navigatie die nog moet starten.
+        """
+        with self._lock:
+            self._pump()
+            end = time.time() + grace
+            while not self._loading and time.time() < end:
+                try:
+                    self._dispatch(self._recv(end - time.time()))
+                except TimeoutException:
+                    break
+            if not self._loading:
+                return
+            end = time.time() + self._page_load_timeout
+            while self._loading:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    self._loading = False
+                    self._send("Page.stopLoading")
+                    raise TimeoutException(f"Navigatie niet geladen binnen {self._page_load_timeout:.0f}s.")
+                try:
+                    self._dispatch(self._recv(min(remaining, 1.0)))
+                except TimeoutException:
+                    continue
+
+    def _send(self, method: str, params: Optional[Dict] = None, timeout: float = 30.0) -> Dict:
+        with self._lock:
+            self._msg_id += 1
+            msg_id = self._msg_id
+            t0 = time.perf_counter()
+            try:
+                self._ws.send(json.dumps({"id": msg_id, "method": method, "params": params or {}}))
+            except (websocket.WebSocketConnectionClosedException, OSError) as e:
+                raise CDPError(f"DevTools-verbinding verbroken: {e}")
+            end = time.time() + timeout
+            while True:
+                msg = self._recv(end - time.time())
+                if msg.get("id") == msg_id:
+                    break
+                self._dispatch(msg)
+            stat = self.command_stats.setdefault(method, [0, 0.0])
+            stat[0] += 1
+            stat[1] += time.perf_counter() - t0
+        if "error" in msg:
+            raise CDPError(f"{method}: {msg['error'].get('message')}")
+        return msg.get("result", {})
+
+    def _wait_event(self, method: str, after_seq: int, timeout: float) -> Dict:
+        end = time.time() + timeout
+        with self._lock:
+            while True:
+                for seq, m, params in self._events:
+                    if seq > after_seq and m == method:
+                        return params
+                remaining = end - time.time()
+                if remaining <= 0:
+                    raise TimeoutException(f"Timeout ({timeout:.0f}s) wachtend op {method}.")
+                try:
+                    self._dispatch(self._recv(min(remaining, 1.0)))
+                except TimeoutException:
+                    continue
+
+    def _check(self, result: Dict) -> Dict:
+        exc = result.get("exceptionDetails")
+        if exc:
+            desc = (exc.get("exception") or {}).get("description") or exc.get("text", "")
+            raise JavascriptException(desc)
+        return result["result"]
+
+    def _runtime(self, method: str, params: Dict) -> Dict:
+        """Runtime-call met retry zolang de pagina navigeert; stale objectIds → Stale-exceptie."""
+        self._wait_pending_navigation()
+        end = time.time() + 10
+        while True:
+            try:
+                return self._check(self._send(method, params))
+            except CDPError as e:
+                text = str(e)
+                if any(s in text for s in _STALE):
+                    raise StaleElementReferenceException(text)
+                if any(s in text for s in _NAVIGATING) and time.time() < end:
+                    self._wait_pending_navigation(grace=0.1)
+                    continue
+                raise
+
+    def _call_on(self, object_id: str, fn: str, args: List[Any], by_value: bool = True):
+        res = self._runtime("Runtime.callFunctionOn", {
+            "objectId": object_id,
+            "functionDeclaration": fn,
+            "arguments": [self._arg(a) for a in args],
+            "returnByValue": by_value,
+            "awaitPromise": True,
+            "objectGroup": OBJECT_GROUP,
+        })
+        return res.get("value") if by_value else res
+
+    @staticmethod
+    def _arg(a) -> Dict:
+        if isinstance(a, CDPElement):
+            return {"objectId": a.id}
+        return {"value": a}
+
+    def _find(self, by: str, value: Optional[str], root: Optional[str] = None,
+              multiple: bool = False) -> List[CDPElement]:
+        if root is None:
+            arr = self._runtime("Runtime.evaluate", {
+                "expression": f"({_FIND_JS})({json.dumps(by)}, {json.dumps(value)}, document)",
+                "objectGroup": OBJECT_GROUP,
+            })
+        else:
+            arr = self._call_on(
+                root, f"function(by, v){{ return ({_FIND_JS})(by, v, this); }}", [by, value], by_value=False
+            )
+        props = self._send("Runtime.getProperties", {"objectId": arr["objectId"], "ownProperties": True})
+        els = [
+            CDPElement(self, p["value"]["objectId"])
+            for p in sorted(
+                (p for p in props.get("result", []) if p["name"].isdigit()),
+                key=lambda p: int(p["name"]),
+            )
+            if p.get("value", {}).get("objectId")
+        ]
+        if not els and not multiple:
+            raise NoSuchElementException(f"Geen element voor {by}={value!r}")
+        return els
+
+    def _evaluate(self, expression: str):
+        return self._runtime("Runtime.evaluate", {
+            "expression": expression, "returnByValue": True, "awaitPromise": True,
+        }).get("value")
+
+    # ---- WebDriver-API ----
+    def set_page_load_timeout(self, seconds: float):
+        self._page_load_timeout = float(seconds)
+
+    def _navigate(self, method: str, params: Dict):
+        with self._lock:
+            seq = self._event_seq
+            self._send("Runtime.releaseObjectGroup", {"objectGroup": OBJECT_GROUP})
+            res = self._send(method, params)
+            if res.get("errorText"):
+                raise WebDriverException(f"{method}: {res['errorText']}")
+            try:
+                self._wait_event("Page.loadEventFired", seq, self._page_load_timeout)
+            except TimeoutException:
+                self._send("Page.stopLoading")
+                raise
+
+    def get(self, url: str):
+        self._navigate("Page.navigate", {"url": url})
+
+    def refresh(self):
+        self._navigate("Page.reload", {"ignoreCache": False})
+
+    def execute_script(self, script: str, *args):
+        fn = f"function(){{ {script}\n}}"
+        elements = [a for a in args if isinstance(a, CDPElement)]
+        if elements:
+            return self._call_on(elements[0].id, fn, list(args))
+        return self._evaluate(f"({fn}).apply(null, {json.dumps(list(args))})")
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: Dict) -> Dict:
+        return self._send(cmd, cmd_args)
+
+    def find_element(self, by: str = By.ID, value: Optional[str] = None) -> CDPElement:
+        return self._find(by, value)[0]
+
+    def find_elements(self, by: str = By.ID, value: Optional[str] = None) -> List[CDPElement]:
+        return self._find(by, value, multiple=True)
+
+    def add_cookie(self, cookie: Dict):
+        params = {"url": self.current_url}
+        params.update(cookie)
+        self._send("Network.setCookie", params)
+
+    @property
+    def current_url(self) -> str:
+        return self._evaluate("location.href")
+
+    @property
+    def title(self) -> str:
+        return self._evaluate("document.title")
+
+    @property
+    def page_source(self) -> str:
+        return self._evaluate("document.documentElement.outerHTML")
+
+    @property
+    def window_handles(self) -> List[str]:
+        return ["main"]  # één tab per driver
+
+    def quit(self):
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._user_data_dir:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+
+    def latency_stats(self) -> Dict[str, float]:
+        """Gemiddelde latentie (ms) per DevTools-methode."""
+        return {m: round(1000 * tot / n, 3) for m, (n, tot) in self.command_stats.items() if n}
+
+
+# ---------------- Vergelijking met Selenium ----------------
+def _tree_rss_mb(pid: int) -> float:
+    """RSS (MB) van pid + alle afstammelingen (Linux /proc)."""
+    from poll_watchdog import process_tree
+
+    total_kb = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return total_kb / 1024
+
+
+def _bench(driver, n: int) -> Dict[str, float]:
+    out = {}
+    for name, op in (
+        ("execute_script", lambda: driver.execute_script("return document.readyState")),
+        ("find_element", lambda: driver.find_element(By.TAG_NAME, "body")),
+        ("find+text", lambda: driver.find_element(By.TAG_NAME, "title").get_attribute("text")),
+    ):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            op()
+        out[name] = round(1000 * (time.perf_counter() - t0) / n, 3)
+    return out
+
+
+def _main():
+    ap = argparse.ArgumentParser(description="CDP-backend vs Selenium")
+    ap.add_argument("--compare", type=int, default=100, metavar="N", help="aantal calls per operatie")
+    ap.add_argument("--url", default=Config.LOGIN_URL)
+    args = ap.parse_args()
+
+    from selenium_monitor import AIBVMonitorBot
+
+    for backend in ("selenium", "cdp"):
+        Config.DRIVER_BACKEND = backend
+        bot = AIBVMonitorBot()
+        try:
+            t0 = time.perf_counter()
+            bot.setup_driver()
+            startup = time.perf_counter() - t0
+            bot.driver.get(args.url)
+            ms = _bench(bot.driver, args.compare)
+            pid = bot.driver.service.process.pid
+            rss = _tree_rss_mb(pid) if sys.platform.startswith("linux") else float("nan")
+            print(f"[{backend}] start {startup:.2f}s, RSS {rss:.0f} MB, ms/call {ms}")
+        finally:
+            bot.close()
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,15 +1,16 @@
 # config.py
 import os
 from datetime import datetime, timedelta
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 WEEKDAY_NAMES_NL = ["ma", "di", "wo", "do", "vr", "za", "zo"]
 
-def business_days_from_today(n: int) -> datetime:
-    """Return datetime voor 'n' werkdagen vanaf vandaag (excl. weekend)."""
-    d = datetime.now()
+def business_days_from_today(n: int, now: Optional[datetime] = None) -> datetime:
+    """Return datetime voor 'n' werkdagen vanaf vandaag (excl. weekend). 'now' bevriest de klok."""
+    d = now or datetime.now()
     added = 0
     while added < n:
         d += timedelta(days=1)
@@ -17,9 +18,9 @@ def business_days_from_today(n: int) -> datetime:
             added += 1
     return d
 
-def is_within_n_business_days(date_obj: datetime, n: int) -> bool:
+def is_within_n_business_days(date_obj: datetime, n: int, now: Optional[datetime] = None) -> bool:
     """Check of date_obj binnen n werkdagen vanaf vandaag ligt (weekend telt niet mee)."""
-    target = business_days_from_today(n)
+    target = business_days_from_today(n, now)
     return date_obj.date() <= target.date()
 
 def get_next_monday_if_weekend(dt: datetime) -> datetime:
@@ -36,31 +37,84 @@ class Config:
     AIBV_USERNAME = os.environ.get("AIBV_USERNAME", "")
     AIBV_PASSWORD = os.environ.get("AIBV_PASSWORD", "")
     LOGIN_URL = "https://planning.aibv.be/Login.aspx?ReturnUrl=%2fIndex.aspx%3flang%3dnl"
+    RESERVATIE_URL = "https://planning.aibv.be/Reservaties/ReservatieOverzicht.aspx?lang=nl"
+    # Snelle login: consent-cookies vooraf, credentials in één script, direct naar reservaties
+    FAST_LOGIN = os.environ.get("FAST_LOGIN", "false").lower() == "true"
 
     # Station
     STATION_ID = os.environ.get("STATION_ID", "8")  # '8' = Montignies-sur-Sambre
     STATION_NAME = "Montignies-sur-Sambre"
 
+    # Browserbackend: "selenium" (chromedriver) of "cdp" (rechtstreeks via DevTools)
+    DRIVER_BACKEND = os.environ.get("DRIVER_BACKEND", "selenium").lower()
+
     # Monitoring / timeouts
     REFRESH_DELAY = int(os.environ.get("REFRESH_DELAY", "5"))
     POSTBACK_TIMEOUT = int(os.environ.get("POSTBACK_TIMEOUT", "15"))
+    CYCLE_DEADLINE = int(os.environ.get("CYCLE_DEADLINE", "45"))  # harde limiet per pollcyclus
+    RECOVERY_DEADLINE = int(os.environ.get("RECOVERY_DEADLINE", "180"))  # limiet per herstelactie (incl. relogin)
+    PAGE_LOAD_TIMEOUT = int(os.environ.get("PAGE_LOAD_TIMEOUT", "15"))  # per refresh, < CYCLE_DEADLINE
+    STALL_THRESHOLD = int(os.environ.get("STALL_THRESHOLD", "3"))  # stalls vóór escalatie
+
+    # Requestbudget per AIBV-account (gedeeld door alle monitors/targets)
+    REQUEST_BUDGET_PER_MIN = float(os.environ.get("REQUEST_BUDGET_PER_MIN", "30"))
+    REQUEST_BURST = int(os.environ.get("REQUEST_BURST", "3"))
+    # Prioriteit per target voor de scheduler: "station=prio" of "station|dd/mm/jjjj=prio"
+    TARGET_PRIORITIES = {
+        k.strip(): float(v)
+        for k, v in (
+            item.split("=", 1)
+            for item in os.environ.get("TARGET_PRIORITIES", "").split(",")
+            if "=" in item
+        )
+    }
+
+    # Telegram: nieuwe-slot-meldingen binnen dit venster worden één bericht
+    NOTIFY_COALESCE_SEC = float(os.environ.get("NOTIFY_COALESCE_SEC", "2"))
+
+    # Snapshots van de slottabel (leeg = uit); ringbuffer met harde limiet op schijf
+    SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "")
+    SNAPSHOT_MAX_MB = float(os.environ.get("SNAPSHOT_MAX_MB", "50"))
+
+    # Lokale alleen-lezen API met de open slots (0 = uit)
+    OPEN_API_HOST = os.environ.get("OPEN_API_HOST", "127.0.0.1")
+    OPEN_API_PORT = int(os.environ.get("OPEN_API_PORT", "0"))
 
     # Omgeving
     IS_HEROKU = os.environ.get("IS_HEROKU", "false").lower() == "true"
     TEST_MODE = os.environ.get("TEST_MODE", "true").lower() == "true"
     BOOKING_ENABLED = os.environ.get("BOOKING_ENABLED", "false").lower() == "true"
 
+    # Sharding: targets (station, week, voertuig) verdelen over workerprocessen
+    SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "0"))  # 0 = alles in één proces
+    LEASE_DB_PATH = os.environ.get("LEASE_DB_PATH", "leases.sqlite3")
+    LEASE_TTL = int(os.environ.get("LEASE_TTL", "60"))  # sec; verlopen lease = target wees
+    # meer targets dan workers: na zoveel sec geeft een worker zijn target door (rotatie)
+    SHARD_SLICE_SEC = int(os.environ.get("SHARD_SLICE_SEC", "600"))
+    MONITOR_STATIONS = [
+        s.strip() for s in os.environ.get("MONITOR_STATIONS", STATION_ID).split(",") if s.strip()
+    ]
+    # aantal weken vanaf week van morgen; enkel slots binnen 3 werkdagen tellen, dus weken
+    # die daar tijdens een run van 24u niet in vallen worden overgeslagen (praktisch max 2)
+    MONITOR_WEEKS = int(os.environ.get("MONITOR_WEEKS", "1"))
+
     @staticmethod
-    def get_tomorrow_week_monday_str():
+    def get_tomorrow_week_monday_str(now: Optional[datetime] = None):
         """
         Maandag (dd/mm/YYYY) van de week waarin morgen valt.
         Als morgen in weekend valt, neem volgende maandag.
         """
-        tomorrow = datetime.now() + timedelta(days=1)
+        tomorrow = (now or datetime.now()) + timedelta(days=1)
         monday = get_next_monday_if_weekend(tomorrow)
         monday = monday - timedelta(days=monday.weekday())  # normaliseer naar maandag
         return monday.strftime("%d/%m/%Y")
 
+    @staticmethod
+    def get_monitor_week_mondays(n: int) -> list:
+        """Maandagen (dd/mm/YYYY) van 'n' opeenvolgende weken, te beginnen met de week van morgen."""
+        first = datetime.strptime(Config.get_tomorrow_week_monday_str(), "%d/%m/%Y")
+        return [(first + timedelta(weeks=i)).strftime("%d/%m/%Y") for i in range(max(1, n))]
+
 if __name__ == "__main__":
     print("✅ Config loaded")
     print("TEST_MODE:", Config.TEST_MODE)
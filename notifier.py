@@ -0,0 +1,162 @@
+# notifier.py
+"""
+Uitgaande Telegram-berichten via een wachtrij per chat.
+
+- Alerts (nieuwe slots) gaan vóór statusantwoorden.
+- Alerts die binnen NOTIFY_COALESCE_SEC binnenkomen worden tot één bericht gebundeld.
+- Te lange berichten (> 4096 tekens) worden in pagina's opgesplitst.
+- Verzendlatentie (enqueue → verzonden) wordt bijgehouden.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from config import Config
+
+log = logging.getLogger("TG_NOTIFY")
+
+TELEGRAM_MAX_LEN = 4096
+PAGE_HEADER_RESERVE = 16  # ruimte voor "(12/34)\n"
+
+PRIO_ALERT = 0
+PRIO_STATUS = 1
+
+SendFn = Callable[[int, str], Awaitable]
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_LEN) -> List[str]:
+    """Splits op regelgrenzen in pagina's van max 'limit' tekens (incl. paginakop)."""
+    if len(text) <= limit:
+        return [text]
+    body = limit - PAGE_HEADER_RESERVE
+    chunks: List[str] = []
+    cur = ""
+    for line in text.split("\n"):
+        # regel die op zich al te lang is: hard knippen
+        while len(line) > body:
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.append(line[:body])
+            line = line[body:]
+        if cur and len(cur) + 1 + len(line) > body:
+            chunks.append(cur)
+            cur = line
+        else:
+            cur = f"{cur}\n{line}" if cur else line
+    if cur:
+        chunks.append(cur)
+    n = len(chunks)
+    return [f"({i}/{n})\n{c}" for i, c in enumerate(chunks, 1)]
+
+
+class _Item:
+    __slots__ = ("priority", "seq", "text", "coalesce", "enqueued")
+
+    def __init__(self, priority: int, seq: int, text: str, coalesce: bool, enqueued: float):
+        self.priority = priority
+        self.seq = seq
+        self.text = text
+        self.coalesce = coalesce
+        self.enqueued = enqueued
+
+
+class NotificationQueue:
+    def __init__(self, send: SendFn, coalesce_window: Optional[float] = None, window: int = 500):
+        self._send = send
+        self.coalesce_window = Config.NOTIFY_COALESCE_SEC if coalesce_window is None else coalesce_window
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: Dict[int, List[_Item]] = {}
+        self._wakeups: Dict[int, asyncio.Event] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._seq = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.sent_messages = 0
+        self.sent_pages = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+
+    # ---- enqueue ----
+    def enqueue(self, chat_id: int, text: str, priority: int = PRIO_STATUS, coalesce: bool = False):
+        """Zet een bericht in de wachtrij. Mag vanuit elke thread aangeroepen worden."""
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._enqueue(chat_id, text, priority, coalesce, time.monotonic())
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(
+                self._enqueue, chat_id, text, priority, coalesce, time.monotonic()
+            )
+        else:
+            raise RuntimeError("NotificationQueue is niet gestart.")
+
+    def _enqueue(self, chat_id: int, text: str, priority: int, coalesce: bool, enqueued: float):
+        self._seq += 1
+        self._queues.setdefault(chat_id, []).append(_Item(priority, self._seq, text, coalesce, enqueued))
+        if chat_id not in self._wakeups:
+            self._wakeups[chat_id] = asyncio.Event()
+        if chat_id not in self._workers or self._workers[chat_id].done():
+            self._workers[chat_id] = asyncio.create_task(self._chat_worker(chat_id))
+        self._wakeups[chat_id].set()
+
+    # ---- verzenden ----
+    async def _chat_worker(self, chat_id: int):
+        q = self._queues[chat_id]
+        wakeup = self._wakeups[chat_id]
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            while q:
+                head = min(q, key=lambda i: (i.priority, i.seq))
+                if head.coalesce:
+                    # wacht het venster af zodat een burst één bericht wordt
+                    delay = head.enqueued + self.coalesce_window - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    batch = [i for i in q if i.coalesce]
+                    self.coalesced += len(batch) - 1
+                else:
+                    batch = [head]
+                for item in batch:
+                    q.remove(item)
+                await self._deliver(chat_id, "\n".join(i.text for i in batch))
+                now = time.monotonic()
+                self._latencies.extend(now - i.enqueued for i in batch)
+
+    async def _deliver(self, chat_id: int, text: str):
+        pages = split_message(text)
+        for page in pages:
+            try:
+                await self._send(chat_id, page)
+                self.sent_pages += 1
+            except Exception:
+                self.failures += 1
+                log.exception(f"Verzenden naar chat {chat_id} mislukt")
+        self.sent_messages += 1
+
+    # ---- metrics ----
+    def stats(self) -> Dict:
+        lat = sorted(self._latencies)
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "sent_messages": self.sent_messages,
+            "sent_pages": self.sent_pages,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "latency_avg_sec": round(sum(lat) / len(lat), 2) if lat else 0.0,
+            "latency_p95_sec": round(lat[int(0.95 * (len(lat) - 1))], 2) if lat else 0.0,
+            "latency_max_sec": round(lat[-1], 2) if lat else 0.0,
+        }
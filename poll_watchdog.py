@@ -0,0 +1,231 @@
+# poll_watchdog.py
+"""
+Watchdog voor de monitoringlus.
+
+- Elke pollcyclus krijgt een deadline (CYCLE_DEADLINE). Loopt een cyclus vast
+  (bv. een driver.refresh() die blijft hangen), dan roept een achtergrondthread
+  on_hang() aan om de browser af te schieten zodat de blokkerende call terugkeert.
+- Opeenvolgende mislukte/lege cycli (stalls) escaleren stapsgewijs:
+  soft reload → flow hervatten → driver herstarten.
+- Herstelacties lopen onder een eigen, ruimere deadline (RECOVERY_DEADLINE, zie
+  recovering()); hangt herstel, dan wordt de browser ook afgeschoten en volgt een herstart.
+- stats() toont stalls en de tijd sinds de laatste geslaagde poll.
+- kill_process_tree() schiet een driver samen met alle Chrome-kindprocessen af.
+"""
+import os
+import time
+import signal
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+
+log = logging.getLogger("AIBV_WATCHDOG")
+
+SOFT_RELOAD = "soft_reload"
+RESUME_FLOW = "resume_flow"
+RESTART_DRIVER = "restart_driver"
+ESCALATION = (SOFT_RELOAD, RESUME_FLOW, RESTART_DRIVER)
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid + alle afstammelingen (Linux /proc); elders enkel [pid]."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return [pid]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        todo.extend(children.get(p, []))
+    return tree
+
+
+def kill_process_tree(pid: int) -> int:
+    """
+    SIGKILL voor pid en al zijn afstammelingen (chromedriver → Chrome → renderers).
+    De boom wordt eerst volledig opgehaald: eenmaal gekilld worden kinderen wees.
+    Retourneert het aantal gekilde processen.
+    """
+    killed = 0
+    for p in process_tree(pid):
+        try:
+            os.kill(p, getattr(signal, "SIGKILL", signal.SIGTERM))
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+    return killed
+
+
+class CycleWatchdog:
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        stall_threshold: Optional[int] = None,
+        on_hang: Optional[Callable[[], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        recovery_deadline: Optional[float] = None,
+    ):
+        self.deadline = deadline or Config.CYCLE_DEADLINE
+        self.recovery_deadline = recovery_deadline or Config.RECOVERY_DEADLINE
+        self.stall_threshold = max(1, stall_threshold or Config.STALL_THRESHOLD)
+        self.on_hang = on_hang
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cycle_start: Optional[float] = None
+        self._hang_fired = False
+        self._active_deadline = self.deadline
+        self._restart_pending = False  # herstel hing → volgende mislukte cyclus = herstart
+        self._level = 0
+
+        self.cycles = 0
+        self.stalls_total = 0
+        self.consecutive_stalls = 0
+        self.hangs = 0
+        self.escalations: Dict[str, int] = {a: 0 for a in ESCALATION}
+        self.last_ok: Optional[float] = None
+        self.max_gap = 0.0
+        self._started_at = clock()
+
+    # ---- achtergrondthread ----
+    def start(self):
+        self._stop.clear()
+        self._started_at = self.clock()
+        self._thread = threading.Thread(target=self._run, name="aibv-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(2)
+
+    def _run(self):
+        while not self._stop.wait(1.0):
+            with self._lock:
+                start = self._cycle_start
+                deadline = self._active_deadline
+                overdue = (
+                    start is not None
+                    and not self._hang_fired
+                    and self.clock() - start > deadline
+                )
+                if overdue:
+                    self._hang_fired = True
+                    self.hangs += 1
+            if overdue:
+                log.error(f"Pollcyclus/herstel hangt > {deadline:.0f}s; browser wordt afgebroken.")
+                if self.on_hang:
+                    try:
+                        self.on_hang()
+                    except Exception as e:
+                        log.warning(f"on_hang faalde: {e}")
+
+    # ---- cycli ----
+    def begin_cycle(self):
+        with self._lock:
+            self._cycle_start = self.clock()
+            self._active_deadline = self.deadline
+            self._hang_fired = False
+
+    @contextmanager
+    def recovering(self):
+        """Herstelactie onder RECOVERY_DEADLINE: ook een hangende relogin wordt afgebroken."""
+        with self._lock:
+            self._cycle_start = self.clock()
+            self._active_deadline = self.recovery_deadline
+            self._hang_fired = False
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._hang_fired:
+                    self._restart_pending = True
+                self._cycle_start = None
+                self._active_deadline = self.deadline
+                self._hang_fired = False
+
+    @contextmanager
+    def paused(self):
+        """Wachttijd (bv. op het requestbudget) telt niet mee voor de deadline."""
+        with self._lock:
+            start, self._cycle_start = self._cycle_start, None
+            t0 = self.clock()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if start is not None:
+                    self._cycle_start = start + (self.clock() - t0)
+
+    def end_cycle(self, ok: bool) -> Optional[str]:
+        """
+        Sluit de cyclus af. Retourneert de herstelactie die nu moet gebeuren
+        (SOFT_RELOAD / RESUME_FLOW / RESTART_DRIVER) of None.
+        """
+        with self._lock:
+            now = self.clock()
+            hung = self._hang_fired
+            self._cycle_start = None
+            self.cycles += 1
+
+            if ok and not hung:
+                self._restart_pending = False
+                gap = now - (self.last_ok if self.last_ok is not None else self._started_at)
+                self.max_gap = max(self.max_gap, gap)
+                self.last_ok = now
+                self.consecutive_stalls = 0
+                self._level = 0
+                return None
+
+            self.stalls_total += 1
+            self.consecutive_stalls += 1
+            if self._restart_pending:
+                hung, self._restart_pending = True, False
+            if hung:
+                # browser is afgeschoten: enkel een herstart helpt nog
+                self._level = len(ESCALATION) - 1
+            elif self.consecutive_stalls < self.stall_threshold:
+                return None
+
+            action = ESCALATION[min(self._level, len(ESCALATION) - 1)]
+            self._level += 1
+            self.consecutive_stalls = 0
+            self.escalations[action] += 1
+            log.warning(f"Watchdog escaleert: {action} (stalls totaal {self.stalls_total})")
+            return action
+
+    # ---- metrics ----
+    def seconds_since_ok(self) -> float:
+        with self._lock:
+            ref = self.last_ok if self.last_ok is not None else self._started_at
+            return self.clock() - ref
+
+    def stats(self) -> Dict:
+        since = self.seconds_since_ok()
+        with self._lock:
+            return {
+                "cycles": self.cycles,
+                "stalls_total": self.stalls_total,
+                "consecutive_stalls": self.consecutive_stalls,
+                "hangs": self.hangs,
+                "escalations": dict(self.escalations),
+                "since_last_ok_sec": round(since, 1),
+                "max_gap_sec": round(max(self.max_gap, since), 1),
+                "healthy": since < self.deadline + Config.REFRESH_DELAY * self.stall_threshold,
+            }
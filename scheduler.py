@@ -0,0 +1,462 @@
+# scheduler.py
+"""
+Centraal requestbudget + eerlijke scheduler voor alle polling-targets.
+
+- TokenBucket: X requests per minuut (met burst) per account/host, in-process.
+- SqliteTokenBucket: zelfde budget, maar gedeeld tussen processen (sharding).
+- FairScheduler: deelt pollslots uit over targets volgens prioriteit en recente
+  churn (targets waar net iets veranderde komen vaker aan de beurt), en houdt
+  wachtrijdiepte en wachttijden bij.
+- SqliteFairScheduler: zelfde stride-logica, maar wachtrij, passes en churn staan in
+  de lease store zodat targets van verschillende workerprocessen echt met elkaar
+  concurreren om hetzelfde budget.
+
+Prioriteit per target komt uit TARGET_PRIORITIES ("8=2,9|26/10/2026=0.5"): eerst de
+volledige key station|week, dan enkel het station, anders 1.
+"""
+import time
+import sqlite3
+import threading
+from collections import deque
+from contextlib import closing
+from typing import Callable, Deque, Dict, List, Optional
+
+from config import Config
+
+Clock = Callable[[], float]
+
+CHURN_HALF_LIFE = 600.0  # sec; churn-score halveert elke 10 min
+STALE_TICKET_SEC = 10.0  # wachtrijticket van een gestorven proces telt niet meer mee
+TICKET_POLL_SEC = 0.1  # hoe vaak een wachtend proces kijkt of het aan de beurt is
+
+
+def target_priority(key: str) -> float:
+    """Prioriteit van 'station|week' uit TARGET_PRIORITIES (standaard 1)."""
+    prios = Config.TARGET_PRIORITIES
+    if key in prios:
+        return prios[key]
+    return prios.get(key.split("|", 1)[0], 1.0)
+
+
+def _decayed(score: float, t: float, now: float) -> float:
+    if not score:
+        return 0.0
+    return score * 0.5 ** ((now - t) / CHURN_HALF_LIFE)
+
+
+def _stride(priority: float, churn: float) -> float:
+    return 1.0 / (max(0.01, priority) * (1.0 + churn))
+
+
+class TokenBucket:
+    """Klassieke token bucket. try_take() → 0 bij succes, anders sec tot volgende token."""
+    def __init__(self, rate_per_min: float, burst: int, clock: Clock = time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.last = clock()
+
+    def try_take(self) -> float:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def available(self) -> float:
+        now = self.clock()
+        return min(self.burst, self.tokens + (now - self.last) * self.rate)
+
+
+class SqliteTokenBucket:
+    """Token bucket in een SQLite-bestand: één budget voor alle workerprocessen."""
+    def __init__(self, path: str, key: str, rate_per_min: float, burst: int):
+        self.path = path
+        self.key = key
+        self.rate = rate_per_min / 60.0
+        self.burst = max(1, burst)
+        with closing(self._connect()) as c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets ("
+                " bucket_key TEXT PRIMARY KEY, tokens REAL NOT NULL, last REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _refill(self, c: sqlite3.Connection, now: float) -> float:
+        row = c.execute(
+            "SELECT tokens, last FROM token_buckets WHERE bucket_key = ?", (self.key,)
+        ).fetchone()
+        if row is None:
+            return float(self.burst)
+        return min(self.burst, row[0] + (now - row[1]) * self.rate)
+
+    def take(self, c: sqlite3.Connection, now: float) -> float:
+        """try_take() binnen een lopende transactie van de aanroeper."""
+        tokens = self._refill(c, now)
+        wait = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            wait = (1.0 - tokens) / self.rate
+        c.execute(
+            "INSERT INTO token_buckets(bucket_key, tokens, last) VALUES (?, ?, ?) "
+            "ON CONFLICT(bucket_key) DO UPDATE SET tokens = excluded.tokens, last = excluded.last",
+            (self.key, tokens, now),
+        )
+        return wait
+
+    def try_take(self) -> float:
+        now = time.time()  # wandklok: gedeeld tussen processen
+        with closing(self._connect()) as c:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                wait = self.take(c, now)
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        return wait
+
+    def available(self) -> float:
+        with closing(self._connect()) as c:
+            return self._refill(c, time.time())
+
+
+class _Ticket:
+    __slots__ = ("key", "vpass", "seq", "since")
+
+    def __init__(self, key: str, vpass: float, seq: int, since: float):
+        self.key = key
+        self.vpass = vpass
+        self.seq = seq
+        self.since = since
+
+
+class FairScheduler:
+    """
+    Stride-scheduling over targets: elke target heeft een 'pass'; de wachtende target
+    met de laagste pass krijgt het volgende token. Stride = 1 / (prioriteit * (1 + churn)).
+    """
+    def __init__(self, bucket, clock: Clock = time.monotonic, window: int = 500):
+        self.bucket = bucket
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._priority: Dict[str, float] = {}
+        self._churn: Dict[str, List[float]] = {}  # key -> [score, t]
+        self._pass: Dict[str, float] = {}
+        self._waiting: List[_Ticket] = []
+        self._seq = 0
+        self._vtime = 0.0
+        self._waits: Deque[float] = deque(maxlen=window)
+        self.granted = 0
+        self.timeouts = 0
+
+    # ---- targets ----
+    def register(self, key: str, priority: Optional[float] = None):
+        """Zet de prioriteit van 'key' (None = TARGET_PRIORITIES)."""
+        with self._cond:
+            self._priority[key] = max(0.01, priority if priority is not None else target_priority(key))
+            self._pass.setdefault(key, self._vtime)
+
+    def report_churn(self, key: str, n: int = 1):
+        """Meld n wijzigingen (bv. nieuwe slots) voor target 'key'."""
+        with self._cond:
+            self._churn[key] = [self._churn_score(key) + n, self.clock()]
+
+    def _churn_score(self, key: str) -> float:
+        score, t = self._churn.get(key, (0.0, 0.0))
+        return _decayed(score, t, self.clock())
+
+    def _stride(self, key: str) -> float:
+        if key not in self._priority:
+            self._priority[key] = max(0.01, target_priority(key))
+        return _stride(self._priority[key], self._churn_score(key))
+
+    # ---- slots ----
+    def acquire(self, key: str, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Blokkeer tot 'key' een pollslot krijgt. Retourneert de wachttijd (sec),
+        of None bij timeout.
+        """
+        t0 = self.clock()
+        with self._cond:
+            self._pass.setdefault(key, self._vtime)
+            # niet 'sparen' tijdens inactiviteit: pass minstens de huidige virtuele tijd
+            vpass = max(self._pass[key], self._vtime)
+            self._seq += 1
+            ticket = _Ticket(key, vpass, self._seq, t0)
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if min(self._waiting, key=lambda t: (t.vpass, t.seq)) is ticket:
+                        wait = self.bucket.try_take()
+                        if wait <= 0:
+                            waited = self.clock() - t0
+                            self._vtime = vpass
+                            self._pass[key] = vpass + self._stride(key)
+                            self._waits.append(waited)
+                            self.granted += 1
+                            return waited
+                    else:
+                        wait = 0.5
+                    if timeout is not None:
+                        remaining = timeout - (self.clock() - t0)
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            return None
+                        wait = min(wait, remaining)
+                    self._cond.wait(min(wait, 0.5))
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    # ---- metrics ----
+    def stats(self) -> Dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            now = self.clock()
+            return {
+                "queue_depth": len(self._waiting),
+                "oldest_wait_sec": round(max((now - t.since for t in self._waiting), default=0.0), 2),
+                "granted": self.granted,
+                "timeouts": self.timeouts,
+                "wait_avg_sec": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                "wait_p95_sec": round(waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                "wait_max_sec": round(waits[-1], 2) if waits else 0.0,
+                "tokens_available": round(self.bucket.available(), 2),
+                "targets": len(self._pass),
+            }
+
+
+SCHED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sched_targets (
+    budget_key  TEXT NOT NULL,
+    target_key  TEXT NOT NULL,
+    priority    REAL NOT NULL DEFAULT 1,
+    vpass       REAL NOT NULL DEFAULT 0,
+    churn       REAL NOT NULL DEFAULT 0,
+    churn_t     REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (budget_key, target_key)
+);
+CREATE TABLE IF NOT EXISTS sched_tickets (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    budget_key  TEXT NOT NULL,
+    target_key  TEXT NOT NULL,
+    vpass       REAL NOT NULL,
+    since       REAL NOT NULL,
+    seen        REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sched_state (
+    budget_key  TEXT PRIMARY KEY,
+    vtime       REAL NOT NULL DEFAULT 0,
+    granted     INTEGER NOT NULL DEFAULT 0,
+    timeouts    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class SqliteFairScheduler:
+    """
+    FairScheduler over processen heen: elke target (per budget) heeft een rij met
+    prioriteit, pass en churn; wachtende pollers staan als ticket in sched_tickets.
+    Het ticket met de laagste (pass, volgorde) krijgt het volgende token uit de
+    gedeelde bucket, in dezelfde transactie.
+    """
+    def __init__(self, path: str, budget: str, rate_per_min: float, burst: int, window: int = 500):
+        self.path = path
+        self.budget = budget
+        self.bucket = SqliteTokenBucket(path, budget, rate_per_min, burst)
+        self._waits: Deque[float] = deque(maxlen=window)  # wachttijden van dit proces
+        self._lock = threading.Lock()
+        with closing(self._connect()) as c:
+            c.executescript(SCHED_SCHEMA)
+            c.execute("INSERT OR IGNORE INTO sched_state(budget_key) VALUES (?)", (budget,))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _txn(self, fn):
+        with closing(self._connect()) as c:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(c)
+                c.execute("COMMIT")
+                return out
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+
+    def _ensure(self, c: sqlite3.Connection, key: str) -> tuple:
+        row = c.execute(
+            "SELECT priority, vpass, churn, churn_t FROM sched_targets WHERE budget_key = ? AND target_key = ?",
+            (self.budget, key),
+        ).fetchone()
+        if row is None:
+            vtime = c.execute("SELECT vtime FROM sched_state WHERE budget_key = ?", (self.budget,)).fetchone()[0]
+            row = (max(0.01, target_priority(key)), vtime, 0.0, 0.0)
+            c.execute(
+                "INSERT INTO sched_targets(budget_key, target_key, priority, vpass) VALUES (?, ?, ?, ?)",
+                (self.budget, key, row[0], row[1]),
+            )
+        return row
+
+    # ---- targets ----
+    def register(self, key: str, priority: Optional[float] = None):
+        """Zet de prioriteit van 'key' (None = TARGET_PRIORITIES)."""
+        prio = max(0.01, priority if priority is not None else target_priority(key))
+
+        def fn(c):
+            self._ensure(c, key)
+            c.execute(
+                "UPDATE sched_targets SET priority = ? WHERE budget_key = ? AND target_key = ?",
+                (prio, self.budget, key),
+            )
+        self._txn(fn)
+
+    def report_churn(self, key: str, n: int = 1):
+        now = time.time()
+
+        def fn(c):
+            _, _, churn, churn_t = self._ensure(c, key)
+            c.execute(
+                "UPDATE sched_targets SET churn = ?, churn_t = ? WHERE budget_key = ? AND target_key = ?",
+                (_decayed(churn, churn_t, now) + n, now, self.budget, key),
+            )
+        self._txn(fn)
+
+    # ---- slots ----
+    def _try_grant(self, c: sqlite3.Connection, ticket: int, key: str, vpass: float,
+                   since: float) -> Optional[float]:
+        """None = ons ticket is (nog) niet aan de beurt; anders wachttijd tot token (0 = gekregen)."""
+        now = time.time()
+        if c.execute("UPDATE sched_tickets SET seen = ? WHERE id = ?", (now, ticket)).rowcount == 0:
+            # door een ander proces als verlopen opgeruimd (bv. lange pauze) → terug in de rij
+            c.execute(
+                "INSERT INTO sched_tickets(id, budget_key, target_key, vpass, since, seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (ticket, self.budget, key, vpass, since, now),
+            )
+        c.execute("DELETE FROM sched_tickets WHERE seen < ?", (now - STALE_TICKET_SEC,))
+        head = c.execute(
+            "SELECT id FROM sched_tickets WHERE budget_key = ? ORDER BY vpass, id LIMIT 1",
+            (self.budget,),
+        ).fetchone()
+        if head is None or head[0] != ticket:
+            return None
+        wait = self.bucket.take(c, now)
+        if wait > 0:
+            return wait
+        priority, _, churn, churn_t = self._ensure(c, key)
+        c.execute(
+            "UPDATE sched_targets SET vpass = ? WHERE budget_key = ? AND target_key = ?",
+            (vpass + _stride(priority, _decayed(churn, churn_t, now)), self.budget, key),
+        )
+        c.execute(
+            "UPDATE sched_state SET vtime = ?, granted = granted + 1 WHERE budget_key = ?",
+            (vpass, self.budget),
+        )
+        c.execute("DELETE FROM sched_tickets WHERE id = ?", (ticket,))
+        return 0.0
+
+    def acquire(self, key: str, timeout: Optional[float] = None) -> Optional[float]:
+        """Zelfde contract als FairScheduler.acquire, maar over alle processen."""
+        t0 = time.time()
+
+        def enqueue(c):
+            _, vpass, _, _ = self._ensure(c, key)
+            vtime = c.execute("SELECT vtime FROM sched_state WHERE budget_key = ?", (self.budget,)).fetchone()[0]
+            vpass = max(vpass, vtime)
+            cur = c.execute(
+                "INSERT INTO sched_tickets(budget_key, target_key, vpass, since, seen) VALUES (?, ?, ?, ?, ?)",
+                (self.budget, key, vpass, t0, t0),
+            )
+            return cur.lastrowid, vpass
+
+        ticket, vpass = self._txn(enqueue)
+        granted = False
+        try:
+            while True:
+                wait = self._txn(lambda c: self._try_grant(c, ticket, key, vpass, t0))
+                if wait is not None and wait <= 0:
+                    granted = True
+                    waited = time.time() - t0
+                    with self._lock:
+                        self._waits.append(waited)
+                    return waited
+                wait = TICKET_POLL_SEC if wait is None else wait
+                if timeout is not None:
+                    remaining = timeout - (time.time() - t0)
+                    if remaining <= 0:
+                        self._txn(lambda c: c.execute(
+                            "UPDATE sched_state SET timeouts = timeouts + 1 WHERE budget_key = ?",
+                            (self.budget,)))
+                        return None
+                    wait = min(wait, remaining)
+                time.sleep(min(wait, TICKET_POLL_SEC))
+        finally:
+            if not granted:
+                self._txn(lambda c: c.execute("DELETE FROM sched_tickets WHERE id = ?", (ticket,)))
+
+    # ---- metrics ----
+    def stats(self) -> Dict:
+        now = time.time()
+        with closing(self._connect()) as c:
+            depth, oldest = c.execute(
+                "SELECT COUNT(*), MIN(since) FROM sched_tickets WHERE budget_key = ? AND seen >= ?",
+                (self.budget, now - STALE_TICKET_SEC),
+            ).fetchone()
+            granted, timeouts = c.execute(
+                "SELECT granted, timeouts FROM sched_state WHERE budget_key = ?", (self.budget,)
+            ).fetchone()
+            targets = c.execute(
+                "SELECT COUNT(*) FROM sched_targets WHERE budget_key = ?", (self.budget,)
+            ).fetchone()[0]
+        with self._lock:
+            waits = sorted(self._waits)
+        return {
+            "queue_depth": depth,
+            "oldest_wait_sec": round(now - oldest, 2) if oldest else 0.0,
+            "granted": granted,
+            "timeouts": timeouts,
+            "wait_avg_sec": round(sum(waits) / len(waits), 2) if waits else 0.0,
+            "wait_p95_sec": round(waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+            "wait_max_sec": round(waits[-1], 2) if waits else 0.0,
+            "tokens_available": round(self.bucket.available(), 2),
+            "targets": targets,
+            "shared": True,  # wachtrij/tellers gelden voor alle workers samen
+        }
+
+
+# ---------------- Eén scheduler per account/host ----------------
+_schedulers: Dict[str, object] = {}
+_schedulers_lock = threading.Lock()
+_shared_db: Optional[str] = None
+
+
+def budget_key(account: Optional[str] = None, host: str = "planning.aibv.be") -> str:
+    return f"{account if account is not None else Config.AIBV_USERNAME}@{host}"
+
+
+def use_shared_budget(db_path: str):
+    """Laat schedulers in dit proces hun budget en wachtrij in SQLite delen (workerprocessen)."""
+    global _shared_db
+    _shared_db = db_path
+
+
+def get_scheduler(account: Optional[str] = None, host: str = "planning.aibv.be"):
+    """FairScheduler in één proces; SqliteFairScheduler na use_shared_budget()."""
+    key = budget_key(account, host)
+    with _schedulers_lock:
+        sched = _schedulers.get(key)
+        if sched is None:
+            if _shared_db:
+                sched = SqliteFairScheduler(_shared_db, key, Config.REQUEST_BUDGET_PER_MIN, Config.REQUEST_BURST)
+            else:
+                sched = FairScheduler(TokenBucket(Config.REQUEST_BUDGET_PER_MIN, Config.REQUEST_BURST))
+            _schedulers[key] = sched
+        return sched
@@ -3,6 +3,7 @@ import os
 import time
 import logging
 import sys
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Callable, Dict, List, Tuple, Optional
 
@@ -22,9 +23,13 @@ from selenium.common.exceptions import (
 # Lokaal: automatische driver download; op Heroku gebruiken we env paden.
 from webdriver_manager.chrome import ChromeDriverManager
 
+from scheduler import get_scheduler
+from poll_watchdog import CycleWatchdog, SOFT_RELOAD, RESUME_FLOW, RESTART_DRIVER, kill_process_tree
+from snapshots import get_recorder, KIND_ERROR
+from slot_cache import open_slots
+from slot_parser import collect_open_slots, WEEKDAY_PREFIXES
 from config import (
     Config,
-    is_within_n_business_days,
     get_next_monday_if_weekend,
 )
 
@@ -50,9 +55,28 @@ class AIBVMonitorBot:
         self.chassis = None
         self.merk_model = None
         self.indienst = None
+        # Alle voertuigen die op deze sessie wachten (slots hangen niet van het voertuig af)
+        self.vehicles: List[Dict[str, str]] = []
+        # Target: standaard het station uit .env en de week van morgen
+        self.station_id = Config.STATION_ID
+        self.week_value: Optional[str] = None
+        # Pollslots komen uit het centrale budget van dit account
+        self.scheduler = get_scheduler()
+        # Duur (sec) per loginstap van de laatste login, zie _timed()
+        self.login_timings: Dict[str, float] = {}
+        # Hang-/staldetectie tijdens monitor_slots
+        self.watchdog = CycleWatchdog(on_hang=self.kill_browser)
+        self._last_scan_days = 0
+        # Optionele snapshotrecorder (SNAPSHOT_DIR); None = uit
+        self.recorder = get_recorder()
+        # Open slots na elke geslaagde poll; standaard naar de cache van dit proces
+        self.on_open_slots: Optional[Callable[[str, List[str]], None]] = None
 
     # ---------------- Driver ----------------
     def setup_driver(self):
+        if Config.DRIVER_BACKEND == "cdp":
+            return self._setup_cdp_driver()
+
         opts = ChromeOptions()
 
         if Config.TEST_MODE:
@@ -97,6 +121,20 @@ class AIBVMonitorBot:
             )
         return self.driver
 
+    def _setup_cdp_driver(self):
+        """Chrome zonder chromedriver; zelfde API-subset via één DevTools-websocket."""
+        from cdp_backend import CDPDriver
+
+        try:
+            self.driver = CDPDriver.launch()
+            self.driver.set_page_load_timeout(60)
+        except Exception as e:
+            raise RuntimeError(
+                f"Chrome (CDP) startte niet: {e}\n"
+                "Controleer GOOGLE_CHROME_BIN/CHROME_BIN."
+            )
+        return self.driver
+
     # ---------------- Helpers ----------------
     def wait(self, cond, timeout=None):
         try:
@@ -249,60 +287,167 @@ class AIBVMonitorBot:
         except Exception:
             pass
 
+    @contextmanager
+    def _timed(self, step: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.login_timings[step] = round(time.perf_counter() - t0, 3)
+
+    def _log_login_timings(self, mode: str):
+        total = sum(self.login_timings.values())
+        steps = ", ".join(f"{k}={v:.2f}s" for k, v in self.login_timings.items())
+        log.info(f"Login ({mode}) {total:.2f}s: {steps}")
+
+    def _budgeted(self, reason: str):
+        """Eén slot uit het requestbudget voor een navigatie buiten de pollcyclus."""
+        with self.watchdog.paused():
+            waited = self.scheduler.acquire(self.target_key)
+        if waited and waited > 1:
+            log.info(f"{reason}: {waited:.1f}s gewacht op requestbudget")
+
     # ---------------- Flow (geen boeking) ----------------
     def login(self):
+        self._budgeted("login")
+        if Config.FAST_LOGIN:
+            try:
+                return self.login_fast()
+            except Exception as e:
+                log.warning(f"Snelle login mislukt ({e}); terugval op volledige login. {self._dbg_context()}")
+
+        self.login_timings = {}
+        try:
+            return self._login_full()
+        finally:
+            self._log_login_timings("volledig")
+
+    def _login_full(self):
         d = self.driver
-        d.get(Config.LOGIN_URL)
-        self.wait_dom_idle()
-        self.try_accept_cookies_and_set_lang()
+        with self._timed("open_login"):
+            d.get(Config.LOGIN_URL)
+            self.wait_dom_idle()
+        with self._timed("cookies_lang"):
+            self.try_accept_cookies_and_set_lang()
 
         # velden invullen
-        self._fill_login_fields(Config.AIBV_USERNAME, Config.AIBV_PASSWORD)
+        with self._timed("fill_fields"):
+            self._fill_login_fields(Config.AIBV_USERNAME, Config.AIBV_PASSWORD)
 
         # Aanmelden
-        self.click_by_id("Button1")
+        with self._timed("submit"):
+            self.click_by_id("Button1")
 
-        # Als postback hapert: één JS-click retry
-        try:
-            WebDriverWait(d, 6).until(
-                EC.presence_of_element_located((By.XPATH, "//*[contains(@id,'MainContent_btnVoertuigToevoegen') or contains(.,'Reservatie')]"))
-            )
-        except TimeoutException:
+            # Als postback hapert: één JS-click retry
             try:
-                btn = d.find_element(By.ID, "Button1")
-                d.execute_script("arguments[0].click();", btn)
-            except Exception:
-                pass
+                WebDriverWait(d, 6).until(
+                    EC.presence_of_element_located((By.XPATH, "//*[contains(@id,'MainContent_btnVoertuigToevoegen') or contains(.,'Reservatie')]"))
+                )
+            except TimeoutException:
+                try:
+                    btn = d.find_element(By.ID, "Button1")
+                    d.execute_script("arguments[0].click();", btn)
+                except Exception:
+                    pass
 
-        self.switch_to_latest_window(timeout=8)
-        self.wait_dom_idle()
+            self.switch_to_latest_window(timeout=8)
+            self.wait_dom_idle()
 
         # “Reservatie aanmaken”
-        try:
-            self.click_by_id("MainContent_cmdReservatieAutokeuringAanmaken")
-            self.wait_dom_idle()
-        except Exception:
-            d.get("https://planning.aibv.be/Reservaties/ReservatieOverzicht.aspx?lang=nl")
-            self.wait_dom_idle()
+        with self._timed("reservation"):
             try:
-                btn = WebDriverWait(d, 10).until(
-                    EC.element_to_be_clickable((By.ID, "MainContent_cmdReservatieAutokeuringAanmaken"))
-                )
-                d.execute_script("arguments[0].click();", btn)
+                self.click_by_id("MainContent_cmdReservatieAutokeuringAanmaken")
                 self.wait_dom_idle()
-            except TimeoutException:
-                btn = WebDriverWait(d, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and contains(@value,'Reservatie')]"))
+            except Exception:
+                d.get(Config.RESERVATIE_URL)
+                self.wait_dom_idle()
+                try:
+                    btn = WebDriverWait(d, 10).until(
+                        EC.element_to_be_clickable((By.ID, "MainContent_cmdReservatieAutokeuringAanmaken"))
+                    )
+                    d.execute_script("arguments[0].click();", btn)
+                    self.wait_dom_idle()
+                except TimeoutException:
+                    btn = WebDriverWait(d, 10).until(
+                        EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and contains(@value,'Reservatie')]"))
+                    )
+                    d.execute_script("arguments[0].click();", btn)
+                    self.wait_dom_idle()
+
+        with self._timed("flow_step"):
+            return self._wait_flow_step()
+
+    def login_fast(self):
+        """
+        Snelle login: consent-cookies vooraf via CDP (geen banner), NL-URL meteen goed,
+        credentials + submit in één script en daarna rechtstreeks naar het reservatieoverzicht.
+        """
+        d = self.driver
+        self.login_timings = {}
+        try:
+            with self._timed("preseed_cookies"):
+                self._preseed_cookies()
+
+            with self._timed("open_login"):
+                d.get(Config.LOGIN_URL.replace("Login.aspx?", "Login.aspx?lang=nl&"))
+                WebDriverWait(d, Config.POSTBACK_TIMEOUT).until(
+                    EC.presence_of_element_located((By.ID, "txtPassWord"))
+                )
+
+            with self._timed("submit"):
+                filled = d.execute_script("""
+                    const u=document.getElementById('txtUser');
+                    const p=document.getElementById('txtPassWord');
+                    const b=document.getElementById('Button1');
+                    if(!u || !p || !b) return 0;
+                    for (const [e, v] of [[u, arguments[0]], [p, arguments[1]]]) {
+                        e.value=v;
+                        e.dispatchEvent(new Event('input',{bubbles:true}));
+                        e.dispatchEvent(new Event('change',{bubbles:true}));
+                    }
+                    const n=p.value.length;
+                    setTimeout(function(){ b.click(); }, 0);
+                    return n;
+                """, Config.AIBV_USERNAME, Config.AIBV_PASSWORD)
+                if not filled:
+                    raise RuntimeError("Loginvelden niet gevonden of wachtwoord leeg.")
+                WebDriverWait(d, Config.POSTBACK_TIMEOUT).until(
+                    lambda drv: "login.aspx" not in drv.current_url.lower()
+                )
+
+            with self._timed("reservation"):
+                d.get(Config.RESERVATIE_URL)
+                btn = WebDriverWait(d, Config.POSTBACK_TIMEOUT).until(
+                    EC.presence_of_element_located((By.ID, "MainContent_cmdReservatieAutokeuringAanmaken"))
                 )
                 d.execute_script("arguments[0].click();", btn)
-                self.wait_dom_idle()
 
+            with self._timed("flow_step"):
+                return self._wait_flow_step()
+        finally:
+            self._log_login_timings("snel")
+
+    def _preseed_cookies(self):
+        """Zet OneTrust-consent vooraf zodat de cookiebanner niet verschijnt."""
+        stamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        cookies = {
+            "OptanonAlertBoxClosed": stamp,
+            "OptanonConsent": "isIABGlobal=false&interactionCount=1&groups=C0001%3A1",
+        }
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        for name, value in cookies.items():
+            self.driver.execute_cdp_cmd("Network.setCookie", {
+                "name": name, "value": value,
+                "domain": "planning.aibv.be", "path": "/", "secure": True,
+            })
+
+    def _wait_flow_step(self):
         # Wacht op ÉÉN van de mogelijke volgende stappen
         hit = self.wait_for_any([
             ("id", "MainContent_btnVoertuigToevoegen"),                         # overzicht zonder voertuig
             ("id", "MainContent_cmdOpslaan"),                                   # voertuigformulier
             ("id", "MainContent_btnBevestig"),                                   # EU-voertuig-pagina
-            ("id", f"MainContent_rblStation_{Config.STATION_ID}"),               # stationkeuze
+            ("id", f"MainContent_rblStation_{self.station_id}"),               # stationkeuze
             ("id", "MainContent_lbSelectWeek"),                                  # al op weekselectie
         ], timeout=25)
 
@@ -310,18 +455,38 @@ class AIBVMonitorBot:
             raise TimeoutException("Na 'Reservatie aanmaken' verscheen geen herkenbare stap.")
         return True
 
+    def register_vehicle(self, chassis: str, merk_model: str, inschrijfdatum_ddmmyyyy: str) -> bool:
+        """
+        Registreer een (extra) wachtend voertuig op deze sessie, zonder browseractie.
+        False als het chassis al geregistreerd was.
+        """
+        if any(v["chassis"] == chassis for v in self.vehicles):
+            return False
+        self.vehicles.append({
+            "chassis": chassis,
+            "merk_model": merk_model,
+            "indienst": inschrijfdatum_ddmmyyyy,
+        })
+        return True
+
+    def waiting_chassis(self) -> List[str]:
+        """Chassisnummers waaraan een detectie op deze sessie toegewezen wordt."""
+        return [v["chassis"] for v in self.vehicles]
+
     def add_vehicle(self, chassis: str, merk_model: str, inschrijfdatum_ddmmyyyy: str):
         """
         Voeg voertuig toe ALS nodig. Als we al voorbij die stap zijn (bv. EU of station),
-        slaan we dit netjes over.
+        slaan we dit netjes over. Staat het voertuig al in het overzicht, dan kiezen we
+        dat record i.p.v. het opnieuw toe te voegen.
         """
         self.chassis = chassis
         self.merk_model = merk_model
         self.indienst = inschrijfdatum_ddmmyyyy
+        self.register_vehicle(chassis, merk_model, inschrijfdatum_ddmmyyyy)
 
         # Als we al op EU/station/week zitten → overslaan
         if self._exists_id("MainContent_btnBevestig") \
-           or self._exists_id(f"MainContent_rblStation_{Config.STATION_ID}") \
+           or self._exists_id(f"MainContent_rblStation_{self.station_id}") \
            or self._exists_id("MainContent_lbSelectWeek"):
             log.info("Voertuig lijkt al gekozen; add_vehicle() wordt overgeslagen.")
             return
@@ -338,6 +503,11 @@ class AIBVMonitorBot:
             )
             return
 
+        # Voertuig bestaat al in het overzicht → dat record hergebruiken
+        if self._select_existing_vehicle(chassis):
+            log.info(f"Bestaand voertuig {chassis} hergebruikt.")
+            return
+
         # Anders: via knop "Voertuig toevoegen"
         if self._exists_id("MainContent_btnVoertuigToevoegen"):
             self.click_by_id("MainContent_btnVoertuigToevoegen")
@@ -354,6 +524,40 @@ class AIBVMonitorBot:
         # Niets van bovenstaande? Fail fast met context
         raise TimeoutException("Kon geen voertuigstap detecteren (noch knop, noch formulier).")
 
+    def _select_existing_vehicle(self, chassis: str) -> bool:
+        """
+        Kies het bestaande record met dit chassis in het voertuigoverzicht, als dat er
+        ondubbelzinnig is: precies één binnenste tabelrij met het chassis en daarin
+        precies één keuzerondje. Nooit knoppen of links (toevoegen/wijzigen/verwijderen).
+        """
+        needle = chassis.replace("'", "")
+        if not needle:
+            return False
+        rows = self.driver.find_elements(
+            By.XPATH, f"//*[@id='MainContent' or starts-with(@id,'MainContent_')]"
+                      f"//tr[not(.//tr)][contains(translate(normalize-space(.),'abcdefghijklmnopqrstuvwxyz',"
+                      f"'ABCDEFGHIJKLMNOPQRSTUVWXYZ'),'{needle.upper()}')]"
+        )
+        if len(rows) != 1:
+            if rows:
+                log.warning(f"Chassis {chassis} staat in {len(rows)} rijen; geen bestaand record gekozen.")
+            return False
+        radios = rows[0].find_elements(By.XPATH, ".//input[@type='radio']")
+        if len(radios) != 1:
+            return False
+        try:
+            self.driver.execute_script("arguments[0].click();", radios[0])
+            self.wait_dom_idle()
+            if self._exists_id("MainContent_cmdVolgendeStap1"):
+                self.click_by_id("MainContent_cmdVolgendeStap1")
+            WebDriverWait(self.driver, 15).until(
+                EC.presence_of_element_located((By.ID, "MainContent_btnBevestig"))
+            )
+            return True
+        except (TimeoutException, StaleElementReferenceException):
+            log.warning(f"Bestaand voertuig {chassis} kiezen mislukt; opnieuw toevoegen.")
+            return False
+
     def select_eu_vehicle(self):
         # Als EU-pagina zichtbaar → klik; anders als we al verder zijn, gewoon door
         if self._exists_id("MainContent_btnBevestig") and self._exists_id("MainContent_3cc091f5-7a52-43e5-ab6a-5b211b5ceb91"):
@@ -362,12 +566,12 @@ class AIBVMonitorBot:
 
         # stap 3: station
         WebDriverWait(self.driver, 15).until(
-            EC.presence_of_element_located((By.ID, f"MainContent_rblStation_{Config.STATION_ID}"))
+            EC.presence_of_element_located((By.ID, f"MainContent_rblStation_{self.station_id}"))
         )
 
     def select_station(self):
-        # Montignies-sur-Sambre (ID-index uit .env)
-        self.click_by_id(f"MainContent_rblStation_{Config.STATION_ID}")
+        # Standaard Montignies-sur-Sambre (ID-index uit .env); sharding zet self.station_id
+        self.click_by_id(f"MainContent_rblStation_{self.station_id}")
         WebDriverWait(self.driver, 15).until(
             EC.presence_of_element_located((By.ID, "MainContent_lbSelectWeek"))
         )
@@ -405,10 +609,20 @@ class AIBVMonitorBot:
         monday = monday - timedelta(days=monday.weekday())
         return self._select_week_value(monday.strftime("%d/%m/%Y"))
 
+    @property
+    def target_key(self) -> str:
+        return f"{self.station_id}|{self.week_value or 'morgen'}"
+
+    def select_target_week(self) -> bool:
+        """Selecteer self.week_value (dd/mm/YYYY) indien gezet, anders de week van morgen."""
+        if self.week_value:
+            return self._select_week_value(self.week_value)
+        return self.select_week_of_tomorrow()
+
     def _collect_slots(self) -> List[Tuple[datetime, str]]:
         """Return list[(start_dt, human_label)] binnen 3 werkdagen, weekdays only."""
-        out = []
-        now = datetime.now()
+        days = []
+        self._last_scan_days = 0  # 0 na een scan = slottabel niet gerenderd
 
         for i in range(1, 7 + 1):
             try:
@@ -418,10 +632,11 @@ class AIBVMonitorBot:
                 continue
             if not label_txt:
                 continue
+            self._last_scan_days += 1
 
             day_prefix = label_txt.split()[0].lower()
-            if day_prefix not in ("ma", "di", "wo", "do", "vr"):
-                continue
+            if day_prefix not in WEEKDAY_PREFIXES:
+                continue  # weekend: geen extra DOM-calls
 
             try:
                 time_span = self.driver.find_element(By.ID, f"MainContent_rblTijdstip{i}")
@@ -432,21 +647,17 @@ class AIBVMonitorBot:
             if not full_date:
                 continue
 
+            times = []
             radios = time_span.find_elements(By.CSS_SELECTOR, "input[type='radio'][id^='MainContent_rblTijdstip']")
             for r in radios:
                 try:
-                    lb = r.find_element(By.XPATH, "./following-sibling::label")
-                    hhmm = lb.text.strip()
-                    dt = datetime.strptime(full_date + " " + hhmm, "%d/%m/%Y %H:%M")
-                    if dt <= now:
-                        continue
-                    if is_within_n_business_days(dt, 3):
-                        out.append((dt, f"{full_date} {hhmm}"))
+                    times.append(r.find_element(By.XPATH, "./following-sibling::label").text)
                 except Exception:
                     continue
+            days.append((label_txt, full_date, times))
 
-        out.sort(key=lambda x: x[0])
-        return out
+        # filter/sort zelf is browservrij: slot_parser.collect_open_slots (zie bench_parsing.py)
+        return collect_open_slots(days)
 
     # ---------------- Monitoring (zonder boeken) ----------------
     def monitor_slots(
@@ -454,22 +665,38 @@ class AIBVMonitorBot:
         stop_requested: Callable[[], bool],
         duration_sec: int = 24 * 3600,
         status_callback: Optional[Callable[[str], None]] = None,
+        on_new_slot: Optional[Callable[[str, str], None]] = None,
     ) -> Dict:
         """
         Refresh de pagina tot duration_sec of stop.
         Retourneert dict met 'new_slots': List[(ts_seen, label)] en meta.
+        on_new_slot(ts, label) wordt meteen bij elke detectie aangeroepen.
         """
         start = time.time()
         seen: set[str] = set()
         new_events: List[Tuple[str, str]] = []  # (timestamp_seen, slot_label)
 
+        self.scheduler.register(self.target_key)  # prioriteit uit TARGET_PRIORITIES
+
         if not self.filters_initialized:
-            # station & week van morgen
+            # station & week (standaard: week van morgen)
             self.select_station()
-            ok = self.select_week_of_tomorrow()
+            ok = self.select_target_week()
             if not ok:
-                return {"success": False, "error": "Week van morgen niet gevonden in dropdown."}
+                return {"success": False, "error": "Gevraagde week niet gevonden in dropdown."}
+
+        # Een trage refresh moet als gewone timeout falen (soft reload/hervatten) en
+        # niet pas op de cyclusdeadline, waar de watchdog de browser afschiet
+        self.driver.set_page_load_timeout(self._cycle_page_load_timeout())
+        self.watchdog.start()
+        try:
+            return self._monitor_loop(start, seen, new_events, stop_requested,
+                                      duration_sec, status_callback, on_new_slot)
+        finally:
+            self.watchdog.stop()
 
+    def _monitor_loop(self, start, seen, new_events, stop_requested,
+                      duration_sec, status_callback, on_new_slot) -> Dict:
         while True:
             if stop_requested():
                 return {
@@ -488,28 +715,39 @@ class AIBVMonitorBot:
                     "elapsed_sec": int(elapsed),
                 }
 
-            # Zorg dat dropdown aanwezig blijft; zo niet, herstel flow minimaal
+            self.watchdog.begin_cycle()
             try:
-                WebDriverWait(self.driver, 8).until(
-                    EC.presence_of_element_located((By.ID, "MainContent_lbSelectWeek"))
-                )
-            except TimeoutException:
-                # probeer minimaal te herstellen
-                try:
-                    self.select_station()
-                    self.select_week_of_tomorrow()
-                except Exception:
-                    pass
-
-            slots = self._collect_slots()
+                slots = self._poll_once()
+                ok = self._last_scan_days > 0
+                if ok:
+                    self._publish_open_slots([label for _, label in slots])
+            except Exception as e:
+                log.warning(f"Pollcyclus mislukt: {e} | {self._dbg_context()}")
+                self._snapshot_error(e)
+                slots, ok = [], False
+
+            action = self.watchdog.end_cycle(ok)
+            if action:
+                self._recover(action)
+                continue
 
             # detecteer nieuw
+            fresh = 0
             for _, label in slots:
                 if label not in seen:
+                    fresh += 1
                     seen.add(label)
                     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     new_events.append((ts, label))
                     log.info(f"Nieuw slot: [{ts}] {label}")
+                    if on_new_slot:
+                        try:
+                            on_new_slot(ts, label)
+                        except Exception:
+                            pass
+
+            if fresh:
+                self.scheduler.report_churn(self.target_key, fresh)
 
             # optionele statuscallback
             if status_callback:
@@ -518,11 +756,131 @@ class AIBVMonitorBot:
                 except Exception:
                     pass
 
-            # refresh + korte pauze
-            self.driver.refresh()
-            self.wait_dom_idle()
             time.sleep(Config.REFRESH_DELAY)
 
+    @staticmethod
+    def _cycle_page_load_timeout() -> float:
+        """
+        Page-load-timeout tijdens monitoren: ruim onder CYCLE_DEADLINE, met plaats voor
+        wait_dom_idle (POSTBACK_TIMEOUT) en de dropdowncheck (8s) in dezelfde cyclus.
+        """
+        room = Config.CYCLE_DEADLINE - Config.POSTBACK_TIMEOUT - 8 - 2
+        return max(5, min(Config.PAGE_LOAD_TIMEOUT, room))
+
+    def _publish_open_slots(self, labels: List[str]):
+        try:
+            if self.on_open_slots:
+                self.on_open_slots(self.target_key, labels)
+            else:
+                open_slots.update(self.target_key, labels)
+        except Exception as e:
+            log.warning(f"Open slots publiceren mislukt: {e}")
+
+    def _poll_once(self) -> List[Tuple[datetime, str]]:
+        """Eén cyclus: refresh (met slot uit het budget), dropdown bewaken, slots lezen."""
+        self._budgeted("poll")
+        if self.watchdog.cycles:
+            self.driver.refresh()
+            if not self.wait_dom_idle():
+                log.warning("DOM niet idle na refresh (overlay/readyState).")
+
+        # Zorg dat dropdown aanwezig blijft; zo niet, herstel flow minimaal
+        try:
+            WebDriverWait(self.driver, 8).until(
+                EC.presence_of_element_located((By.ID, "MainContent_lbSelectWeek"))
+            )
+        except TimeoutException:
+            log.warning(f"Weekdropdown weg; flow minimaal herstellen. {self._dbg_context()}")
+            self.select_station()
+            self.select_target_week()
+
+        slots = self._collect_slots()
+        if self.recorder:
+            try:
+                self.recorder.record(self.target_key, self._slot_region_html())
+            except Exception as e:
+                log.warning(f"Snapshot mislukt: {e}")
+        return slots
+
+    def _slot_region_html(self) -> str:
+        """outerHTML van de slottabel, zonder hidden inputs (__VIEWSTATE wijzigt elke postback)."""
+        return self.driver.execute_script("""
+            var l=document.getElementById('MainContent_LabelDatum1');
+            var t=l && (l.closest('table') || l.parentElement);
+            if(!t){ var w=document.getElementById('MainContent_lbSelectWeek'); t=w && w.form; }
+            if(!t) return '';
+            var c=t.cloneNode(true);
+            c.querySelectorAll("input[type='hidden']").forEach(function(e){ e.remove(); });
+            return c.outerHTML;
+        """) or ""
+
+    def _snapshot_error(self, err: Exception):
+        if not self.recorder:
+            return
+        try:
+            self.recorder.record(
+                self.target_key, self.driver.page_source, KIND_ERROR,
+                meta={"error": str(err)[:500], "context": self._dbg_context()},
+            )
+        except Exception:
+            pass
+
+    # ---------------- Herstel (watchdog) ----------------
+    def _recover(self, action: str):
+        # eigen (ruimere) deadline: ook een hangende reload/relogin wordt afgeschoten
+        with self.watchdog.recovering():
+            log.warning(f"Herstelactie: {action} | {self._dbg_context()}")
+            try:
+                self._budgeted(f"herstel {action}")
+                if action == SOFT_RELOAD:
+                    self.driver.refresh()
+                    self.wait_dom_idle()
+                elif action == RESUME_FLOW:
+                    self._resume_flow()
+                elif action == RESTART_DRIVER:
+                    self.close()
+                    self.setup_driver()
+                    self.driver.set_page_load_timeout(self._cycle_page_load_timeout())
+                    self._resume_flow(relogin=True)
+            except Exception as e:
+                log.warning(f"Herstelactie {action} mislukt: {e}")
+                self._snapshot_error(e)
+
+    def _resume_flow(self, relogin: bool = False):
+        """Terug naar station/week; zo nodig opnieuw inloggen en voertuig kiezen."""
+        if not relogin:
+            try:
+                self.driver.get(Config.RESERVATIE_URL)
+                self.wait_dom_idle()
+                relogin = "login.aspx" in self.driver.current_url.lower()
+                if not relogin:
+                    self.click_by_id("MainContent_cmdReservatieAutokeuringAanmaken")
+                    self._wait_flow_step()
+            except Exception:
+                relogin = True
+        if relogin:
+            self.login()
+        if not self._exists_id(f"MainContent_rblStation_{self.station_id}") \
+           and not self._exists_id("MainContent_lbSelectWeek"):
+            self.add_vehicle(self.chassis, self.merk_model, self.indienst)
+            self.select_eu_vehicle()
+        self.select_station()
+        self.select_target_week()
+
+    def kill_browser(self):
+        """
+        Schiet chromedriver (CDP-backend: Chrome zelf) af, samen met alle Chrome-
+        kindprocessen, zodat een hangende driver-call meteen faalt (watchdog) en er
+        geen Chrome-boom achterblijft.
+        """
+        try:
+            proc = self.driver.service.process
+            if proc:
+                n = kill_process_tree(proc.pid)
+                log.warning(f"kill_browser: {n} proces(sen) afgeschoten (pid {proc.pid} + kinderen)")
+        except Exception as e:
+            log.warning(f"kill_browser faalde: {e}")
+
     # ---------------- intern ----------------
     def _fill_login_fields(self, username: str, password: str):
         def set_and_verify():
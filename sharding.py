@@ -0,0 +1,494 @@
+# sharding.py
+"""
+Horizontale sharding van monitors over meerdere workerprocessen.
+
+- Elke target (station, week) staat als rij in een lokale SQLite lease store; de
+  voertuigen die op die target wachten staan in 'waiters'. Eén poll per station/week,
+  detecties gelden voor elk wachtend voertuig.
+- Een worker claimt één target tegelijk (één Chrome per worker) en verlengt zijn lease
+  via een heartbeat. Sterft de worker, dan verloopt de lease en neemt een andere worker
+  de target over.
+- Zijn er meer targets dan workers, dan geeft een worker zijn target na SHARD_SLICE_SEC
+  vrij zodra er een target onbeheerd ligt; claims gaan naar de langst niet-gepollde
+  target, zodat alle targets om beurten gemonitord worden.
+- Detecties gaan via één multiprocessing-queue terug naar de Telegram front-end.
+- Elke worker is leider van een eigen procesgroep; chromedriver/Chrome erven die. Sterft
+  of stopt een worker, dan killt de supervisor de hele groep (geen wees-Chrome).
+
+Lokaal testen zonder browser:
+    python sharding.py --dry-run --workers 3 --targets 4 --seconds 20 --kill-one
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing as mp
+from contextlib import closing
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from datetime import datetime, timedelta
+
+from config import Config, business_days_from_today
+from scheduler import get_scheduler, use_shared_budget
+from slot_parser import WINDOW_BUSINESS_DAYS
+
+log = logging.getLogger("AIBV_SHARD")
+
+# (kind, worker_id, target_key, payload)
+ShardEvent = Tuple[str, int, str, object]
+
+# Bot van de target die dit workerproces nu monitort (voor watchdogstats)
+_current_bot = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    target_key  TEXT PRIMARY KEY,
+    payload     TEXT NOT NULL,
+    owner       TEXT,
+    expires_at  REAL NOT NULL DEFAULT 0,
+    active      INTEGER NOT NULL DEFAULT 1,
+    claimed_at  REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    target_key  TEXT NOT NULL,
+    chassis     TEXT NOT NULL,
+    merk_model  TEXT NOT NULL,
+    indienst    TEXT NOT NULL,
+    PRIMARY KEY (target_key, chassis)
+);
+"""
+
+
+@dataclass(frozen=True)
+class MonitorTarget:
+    station_id: str
+    week: str  # maandag dd/mm/YYYY
+    # voertuig waarmee de worker de flow doorloopt; andere wachtende voertuigen: waiters
+    chassis: str
+    merk_model: str
+    indienst: str
+
+    @property
+    def key(self) -> str:
+        # bewust zonder voertuig: beschikbaarheid hangt enkel af van station en week
+        return f"{self.station_id}|{self.week}"
+
+
+def weeks_in_window(mondays: List[str], now: Optional[datetime] = None) -> List[str]:
+    """
+    Enkel weken die tijdens een run van 24u slots binnen WINDOW_BUSINESS_DAYS kunnen
+    hebben; latere weken zouden een worker, Chrome en budget kosten zonder ooit iets
+    te melden (collect_open_slots filtert ze weg).
+    """
+    now = now or datetime.now()
+    last_day = business_days_from_today(WINDOW_BUSINESS_DAYS, now + timedelta(days=1)).date()
+    return [w for w in mondays if datetime.strptime(w, "%d/%m/%Y").date() <= last_day]
+
+
+def build_targets(chassis: str, merk_model: str, indienst: str) -> List[MonitorTarget]:
+    """
+    Alle combinaties van MONITOR_STATIONS x MONITOR_WEEKS voor één voertuig, beperkt
+    tot de weken binnen het werkdagenvenster (zie weeks_in_window).
+    Een extra voertuig levert dezelfde keys op → enkel extra wachters, geen extra polls.
+    """
+    mondays = Config.get_monitor_week_mondays(Config.MONITOR_WEEKS)
+    weeks = weeks_in_window(mondays)
+    if len(weeks) < len(mondays):
+        log.warning(f"MONITOR_WEEKS={Config.MONITOR_WEEKS}: weken {', '.join(mondays[len(weeks):])} "
+                    f"vallen buiten {WINDOW_BUSINESS_DAYS} werkdagen en worden niet gemonitord")
+    return [
+        MonitorTarget(station, week, chassis, merk_model, indienst)
+        for station in Config.MONITOR_STATIONS
+        for week in weeks
+    ]
+
+
+# ---------------- Lease store ----------------
+class LeaseStore:
+    """
+    Leases in een SQLite-bestand. Elke call opent een eigen connectie zodat de store
+    veilig is over processen heen; claims gebeuren in een IMMEDIATE-transactie.
+    """
+    def __init__(self, path: Optional[str] = None, ttl: Optional[int] = None):
+        self.path = path or Config.LEASE_DB_PATH
+        self.ttl = ttl or Config.LEASE_TTL
+        with closing(self._connect()) as c:
+            c.executescript(SCHEMA)
+            cols = {r[1] for r in c.execute("PRAGMA table_info(leases)")}
+            if "claimed_at" not in cols:  # store van een oudere versie
+                c.execute("ALTER TABLE leases ADD COLUMN claimed_at REAL NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        c = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        return c
+
+    def add_targets(self, targets: List[MonitorTarget]) -> int:
+        """
+        Registreer targets; een bestaande station/week krijgt er enkel een wachter bij.
+        Retourneert het aantal nieuwe wachters (0 = voertuig stond er al overal).
+        """
+        added = 0
+        with closing(self._connect()) as c:
+            for t in targets:
+                c.execute(
+                    "INSERT INTO leases(target_key, payload, active) VALUES (?, ?, 1) "
+                    "ON CONFLICT(target_key) DO UPDATE SET active = 1",
+                    (t.key, json.dumps(asdict(t))),
+                )
+                added += c.execute(
+                    "INSERT OR IGNORE INTO waiters(target_key, chassis, merk_model, indienst) "
+                    "VALUES (?, ?, ?, ?)",
+                    (t.key, t.chassis, t.merk_model, t.indienst),
+                ).rowcount
+        return added
+
+    def waiters(self, target_key: str) -> List[str]:
+        """Chassisnummers die op deze station/week wachten."""
+        with closing(self._connect()) as c:
+            rows = c.execute(
+                "SELECT chassis FROM waiters WHERE target_key = ? ORDER BY rowid", (target_key,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def clear(self):
+        with closing(self._connect()) as c:
+            c.execute("DELETE FROM leases")
+            c.execute("DELETE FROM waiters")
+
+    def acquire(self, owner: str, now: Optional[float] = None) -> Optional[MonitorTarget]:
+        """
+        Claim één vrije (of verlopen) target, de langst niet-geclaimde eerst.
+        None als er niets te claimen valt.
+        """
+        now = now or time.time()
+        with closing(self._connect()) as c:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                row = c.execute(
+                    "SELECT target_key, payload FROM leases "
+                    "WHERE active = 1 AND (owner IS NULL OR expires_at < ?) "
+                    "ORDER BY claimed_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    c.execute("COMMIT")
+                    return None
+                c.execute(
+                    "UPDATE leases SET owner = ?, expires_at = ?, claimed_at = ? WHERE target_key = ?",
+                    (owner, now + self.ttl, now, row[0]),
+                )
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                raise
+        return MonitorTarget(**json.loads(row[1]))
+
+    def unclaimed(self, now: Optional[float] = None) -> int:
+        """Aantal actieve targets waar nu geen worker op zit."""
+        now = now or time.time()
+        with closing(self._connect()) as c:
+            return c.execute(
+                "SELECT COUNT(*) FROM leases WHERE active = 1 AND (owner IS NULL OR expires_at < ?)",
+                (now,),
+            ).fetchone()[0]
+
+    def renew(self, owner: str, target_key: str) -> bool:
+        """Verleng de lease. False = lease kwijt (verlopen en door iemand anders geclaimd)."""
+        with closing(self._connect()) as c:
+            cur = c.execute(
+                "UPDATE leases SET expires_at = ? WHERE target_key = ? AND owner = ? AND active = 1",
+                (time.time() + self.ttl, target_key, owner),
+            )
+            return cur.rowcount == 1
+
+    def release(self, owner: str, target_key: str, finished: bool = False):
+        with closing(self._connect()) as c:
+            c.execute(
+                "UPDATE leases SET owner = NULL, expires_at = 0, active = CASE WHEN ? THEN 0 ELSE active END "
+                "WHERE target_key = ? AND owner = ?",
+                (1 if finished else 0, target_key, owner),
+            )
+
+    def release_owner(self, owner: str) -> int:
+        """Geef alle leases van een (dode) owner meteen vrij i.p.v. te wachten op de TTL."""
+        with closing(self._connect()) as c:
+            cur = c.execute(
+                "UPDATE leases SET owner = NULL, expires_at = 0 WHERE owner = ?", (owner,)
+            )
+            return cur.rowcount
+
+    def leases(self) -> List[Dict]:
+        with closing(self._connect()) as c:
+            rows = c.execute(
+                "SELECT target_key, owner, expires_at, active FROM leases ORDER BY target_key"
+            ).fetchall()
+        return [
+            {"target": k, "owner": o, "expires_at": e, "active": bool(a)}
+            for k, o, e, a in rows
+        ]
+
+
+# ---------------- Worker ----------------
+def monitor_target(
+    target: MonitorTarget,
+    stop_requested: Callable[[], bool],
+    on_new_slot: Callable[[str, str], None],
+    on_open_slots: Callable[[str, List[str]], None],
+) -> Dict:
+    """Echte monitor: één browser voor één target (blokkerend)."""
+    global _current_bot
+    from selenium_monitor import AIBVMonitorBot  # pas in het workerproces laden
+
+    bot = _current_bot = AIBVMonitorBot()
+    bot.station_id = target.station_id
+    bot.week_value = target.week
+    bot.on_open_slots = on_open_slots
+    try:
+        bot.setup_driver()
+        bot.login()
+        bot.add_vehicle(target.chassis, target.merk_model, target.indienst)
+        bot.select_eu_vehicle()
+        bot.select_station()
+        if not bot.select_target_week():
+            return {"success": False, "error": f"Week {target.week} niet gevonden in dropdown."}
+        return bot.monitor_slots(stop_requested, 24 * 3600, None, on_new_slot=on_new_slot)
+    finally:
+        _current_bot = None
+        bot.close()
+
+
+def _fake_monitor(
+    target: MonitorTarget,
+    stop_requested: Callable[[], bool],
+    on_new_slot: Callable[[str, str], None],
+    on_open_slots: Callable[[str, List[str]], None],
+) -> Dict:
+    """Dry-run monitor zonder browser: meldt af en toe een verzonnen slot."""
+    n = 0
+    while not stop_requested():
+        time.sleep(random.uniform(0.5, 1.5))
+        n += 1
+        on_new_slot(time.strftime("%Y-%m-%d %H:%M:%S"), f"{target.week} fake-{n:02d}")
+        on_open_slots(target.key, [f"{target.week} fake-{i:02d}" for i in range(max(1, n - 2), n + 1)])
+    return {"success": True, "stopped": True}
+
+
+def _heartbeat(store: LeaseStore, owner: str, target_key: str,
+               done: threading.Event, lost: threading.Event,
+               events=None, worker_id: int = 0,
+               rotate: Optional[threading.Event] = None):
+    interval = max(1.0, store.ttl / 3)
+    started = time.time()
+    while not done.wait(interval):
+        try:
+            if not store.renew(owner, target_key):
+                log.warning(f"[{owner}] lease kwijt voor {target_key}")
+                lost.set()
+                return
+            # tijdslice op en een andere target ligt onbeheerd → beurt doorgeven
+            if (rotate is not None and not rotate.is_set()
+                    and time.time() - started >= Config.SHARD_SLICE_SEC
+                    and store.unclaimed() > 0):
+                log.info(f"[{owner}] tijdslice voorbij, {target_key} wordt vrijgegeven voor rotatie")
+                rotate.set()
+        except Exception as e:
+            log.warning(f"[{owner}] heartbeat fout: {e}")
+        if events is not None:
+            bot = _current_bot
+            events.put(("stats", worker_id, target_key, {
+                "scheduler": get_scheduler().stats(),
+                "watchdog": bot.watchdog.stats() if bot else None,
+            }))
+
+
+def run_worker(worker_id: int, db_path: str, events, stop_event,
+               monitor_fn: Callable = monitor_target):
+    """Hoofdlus van één workerproces: claim → monitor → vrijgeven, tot stop_event."""
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # eigen procesgroep: supervisor kan de hele boom opruimen
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)],
+    )
+    store = LeaseStore(db_path)
+    owner = f"{worker_id}:{os.getpid()}"
+    use_shared_budget(db_path)  # één requestbudget over alle workers
+
+    while not stop_event.is_set():
+        target = store.acquire(owner)
+        if target is None:
+            stop_event.wait(1.0)
+            continue
+
+        log.info(f"[{owner}] target geclaimd: {target.key}")
+        events.put(("claimed", worker_id, target.key, owner))
+        done, lost, rotate = threading.Event(), threading.Event(), threading.Event()
+        hb = threading.Thread(target=_heartbeat,
+                              args=(store, owner, target.key, done, lost, events, worker_id, rotate),
+                              daemon=True)
+        hb.start()
+
+        finished = False
+        try:
+            result = monitor_fn(
+                target,
+                lambda: stop_event.is_set() or lost.is_set() or rotate.is_set(),
+                lambda ts, label, key=target.key: events.put(("slot", worker_id, key, (ts, label))),
+                lambda key, labels: events.put(("open", worker_id, key, labels)),
+            )
+            # 24u verstreken → target is klaar; gestopt/lease kwijt/rotatie → laat hem claimbaar
+            finished = bool(result.get("timeout"))
+            if not result.get("success"):
+                events.put(("error", worker_id, target.key, result.get("error", "Onbekend")))
+        except Exception as e:
+            log.exception(f"[{owner}] monitor fout voor {target.key}")
+            events.put(("error", worker_id, target.key, str(e)))
+            stop_event.wait(5.0)  # niet meteen opnieuw claimen na een crash
+        finally:
+            done.set()
+            hb.join()
+            if not lost.is_set():
+                store.release(owner, target.key, finished=finished)
+            events.put(("released", worker_id, target.key, owner))
+
+
+# ---------------- Supervisor ----------------
+class ShardSupervisor:
+    """
+    Start N workerprocessen op één lease store, herstart gestorven workers en
+    bundelt hun detecties in één queue voor de Telegram front-end.
+    """
+    def __init__(self, workers: Optional[int] = None, db_path: Optional[str] = None,
+                 monitor_fn: Callable = monitor_target):
+        self.workers = workers or max(1, Config.SHARD_WORKERS)
+        self.db_path = db_path or Config.LEASE_DB_PATH
+        self.monitor_fn = monitor_fn
+        self.store = LeaseStore(self.db_path)
+        # spawn: geen fork van threads/asyncio-loop uit de Telegram-app
+        self._ctx = mp.get_context("spawn")
+        self.events = self._ctx.Queue()
+        self.stop_event = self._ctx.Event()
+        self.procs: Dict[int, mp.Process] = {}
+        self.restarts = 0
+
+    def add_targets(self, targets: List[MonitorTarget]) -> int:
+        return self.store.add_targets(targets)
+
+    @staticmethod
+    def _kill_group(p: mp.Process):
+        """Kill de procesgroep van een worker (chromedriver/Chrome die achterbleven)."""
+        if not hasattr(os, "killpg") or p.pid is None:
+            return
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _spawn(self, worker_id: int):
+        p = self._ctx.Process(
+            target=run_worker,
+            args=(worker_id, self.db_path, self.events, self.stop_event, self.monitor_fn),
+            name=f"aibv-worker-{worker_id}",
+            daemon=True,
+        )
+        p.start()
+        self.procs[worker_id] = p
+
+    def start(self):
+        self.stop_event.clear()
+        for i in range(self.workers):
+            self._spawn(i)
+        log.info(f"Supervisor: {self.workers} workers gestart (store={self.db_path})")
+
+    def check_workers(self) -> int:
+        """Herstart gestorven workers; hun leases komen meteen vrij. Retourneert # herstarts."""
+        restarted = 0
+        if self.stop_event.is_set():
+            return 0
+        for worker_id, p in list(self.procs.items()):
+            if p.is_alive():
+                continue
+            self._kill_group(p)
+            freed = self.store.release_owner(f"{worker_id}:{p.pid}")
+            log.warning(f"Worker {worker_id} (pid {p.pid}) gestorven, exit={p.exitcode}; "
+                        f"{freed} lease(s) vrijgegeven")
+            self._spawn(worker_id)
+            restarted += 1
+        self.restarts += restarted
+        return restarted
+
+    def drain_events(self, timeout: float = 0.0) -> List[ShardEvent]:
+        """Haal alle wachtende events op; wacht max 'timeout' sec op het eerste."""
+        out: List[ShardEvent] = []
+        try:
+            out.append(self.events.get(timeout=timeout) if timeout else self.events.get_nowait())
+            while True:
+                out.append(self.events.get_nowait())
+        except Exception:  # queue.Empty
+            pass
+        return out
+
+    def stop(self, timeout: float = 30.0):
+        self.stop_event.set()
+        end = time.time() + timeout
+        for p in self.procs.values():
+            p.join(max(0.1, end - time.time()))
+        for worker_id, p in self.procs.items():
+            if p.is_alive():
+                p.terminate()
+                p.join(5)
+            self._kill_group(p)
+            self.store.release_owner(f"{worker_id}:{p.pid}")
+        log.info("Supervisor: alle workers gestopt")
+
+
+# ---------------- Lokale test ----------------
+def _main():
+    ap = argparse.ArgumentParser(description="Sharded monitor (lokale test)")
+    ap.add_argument("--dry-run", action="store_true", help="fake monitor i.p.v. Chrome")
+    ap.add_argument("--workers", type=int, default=3)
+    ap.add_argument("--targets", type=int, default=4, help="aantal weken (dry-run)")
+    ap.add_argument("--seconds", type=int, default=20)
+    ap.add_argument("--kill-one", action="store_true", help="kill worker 0 halverwege")
+    ap.add_argument("--db", default="shard_test.sqlite3")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    os.environ["LEASE_TTL"] = "6"  # snelle overname in de test (ook in de spawned workers)
+    os.environ["SHARD_SLICE_SEC"] = "5"
+    Config.LEASE_TTL = 6
+
+    sup = ShardSupervisor(args.workers, args.db, _fake_monitor if args.dry_run else monitor_target)
+    sup.store.clear()
+    weeks = Config.get_monitor_week_mondays(args.targets)
+    sup.add_targets([MonitorTarget(Config.STATION_ID, w, "TEST", "Test", "01/01/2020") for w in weeks])
+    sup.start()
+
+    end = time.time() + args.seconds
+    killed = False
+    try:
+        while time.time() < end:
+            for ev in sup.drain_events(timeout=1.0):
+                print("EVENT", ev)
+            if args.kill_one and not killed and time.time() > end - args.seconds / 2:
+                sup.procs[0].kill()
+                killed = True
+                print("KILLED worker 0")
+            sup.check_workers()
+    finally:
+        sup.stop()
+        for lease in sup.store.leases():
+            print("LEASE", lease)
+
+
+if __name__ == "__main__":
+    _main()
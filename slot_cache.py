@@ -0,0 +1,177 @@
+# slot_cache.py
+"""
+In-memory, geversioneerde cache van de slots die NU open staan, per station/week.
+
+- De monitor schrijft na elke geslaagde poll (update); lezers krijgen altijd de cache,
+  er wordt nooit extra gepolld.
+- Elke wijziging verhoogt één globale versie; die dient als ETag en voor long-poll.
+  Met ?target= gelden de versie van die target (0 = onbekend) als ETag en long-poll.
+  Elke andere versie dan de meegestuurde telt als wijziging (ook na een herstart).
+- Optionele lokale HTTP/JSON-API (alleen-lezen):
+    GET /open                  → {"version": .., "targets": {..}}   (ETag / If-None-Match → 304)
+    GET /open?wait=30          → wacht max 30s op een andere versie dan If-None-Match / ?since=
+                                 (max MAX_WAIT_SEC, hoger wordt afgekapt; geen getal ≥ 0 → 400)
+    GET /open?target=8|19/10/2026
+    GET /health
+"""
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from config import Config
+
+log = logging.getLogger("AIBV_CACHE")
+
+MAX_WAIT_SEC = 60
+
+
+class OpenSlotCache:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._targets: Dict[str, Dict] = {}
+        self.version = 0
+
+    def update(self, target: str, labels: List[str]) -> bool:
+        """
+        Zet de open slots van 'target' (chronologisch, zoals de monitor ze levert).
+        True als er iets veranderde (nieuwe versie).
+        """
+        labels = list(labels)
+        now = time.time()
+        with self._cond:
+            cur = self._targets.get(target)
+            if cur is not None and cur["slots"] == labels:
+                cur["checked_at"] = now
+                return False
+            self.version += 1
+            self._targets[target] = {
+                "slots": labels,
+                "version": self.version,
+                "changed_at": now,
+                "checked_at": now,
+            }
+            self._cond.notify_all()
+            return True
+
+    def remove(self, target: str):
+        with self._cond:
+            if self._targets.pop(target, None) is not None:
+                self.version += 1
+                self._cond.notify_all()
+
+    def clear(self):
+        with self._cond:
+            if self._targets:
+                self._targets.clear()
+                self.version += 1
+                self._cond.notify_all()
+
+    def snapshot(self, target: Optional[str] = None) -> Dict:
+        with self._cond:
+            targets = {
+                k: dict(v, slots=list(v["slots"]))
+                for k, v in self._targets.items()
+                if target is None or k == target
+            }
+            return {"version": self.version, "targets": targets}
+
+    def _version_of(self, target: Optional[str]) -> int:
+        if target is None:
+            return self.version
+        entry = self._targets.get(target)
+        return entry["version"] if entry else 0
+
+    def current_version(self, target: Optional[str] = None) -> int:
+        """Globale versie, of die van één target (0 als de target niet bekend is)."""
+        with self._cond:
+            return self._version_of(target)
+
+    def wait_for_change(self, since: int, timeout: float, target: Optional[str] = None) -> int:
+        """
+        Blokkeer tot de versie (globaal of van 'target') verschilt van 'since', of tot
+        timeout. Ook een lagere versie telt: de client kent een vorig proces.
+        Retourneert de huidige versie.
+        """
+        end = time.time() + timeout
+        with self._cond:
+            while self._version_of(target) == since:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._version_of(target)
+
+
+# Eén cache per proces; de monitor schrijft, Telegram en de HTTP-API lezen
+open_slots = OpenSlotCache()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    cache: OpenSlotCache = open_slots
+
+    def log_message(self, fmt, *args):
+        log.debug("%s - " + fmt, self.address_string(), *args)
+
+    def _json(self, status: int, body: Optional[Dict], etag: Optional[str] = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        if body is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        if url.path == "/health":
+            return self._json(200, {"ok": True, "version": self.cache.version})
+        if url.path != "/open":
+            return self._json(404, {"error": "not found"})
+
+        inm = (self.headers.get("If-None-Match") or "").strip('W/"')
+        since = qs.get("since", [inm])[0]
+        since_v = int(since) if since.isdigit() else None
+        bad_wait = {"error": f"wait moet een getal ≥ 0 zijn (seconden; boven {MAX_WAIT_SEC} wordt afgekapt)"}
+        try:
+            wait = float(qs.get("wait", ["0"])[0] or 0)
+        except ValueError:
+            return self._json(400, bad_wait)
+        if not wait >= 0:  # ook nan
+            return self._json(400, bad_wait)
+        wait = min(wait, MAX_WAIT_SEC)
+
+        target = qs.get("target", [None])[0]
+        if wait > 0 and since_v is not None:
+            self.cache.wait_for_change(since_v, wait, target)
+
+        snap = self.cache.snapshot(target)
+        version = snap["version"] if target is None else self.cache.current_version(target)
+        etag = f'"{version}"'
+        if since_v is not None and version == since_v:
+            return self._json(304, None, etag)
+        return self._json(200, snap, etag)
+
+    def _read_only(self):
+        self._json(405, {"error": "read-only"})
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = _read_only
+
+
+def start_api_server(cache: OpenSlotCache = open_slots, host: Optional[str] = None,
+                     port: Optional[int] = None) -> ThreadingHTTPServer:
+    """Start de alleen-lezen API in een daemonthread."""
+    handler = type("OpenSlotHandler", (_Handler,), {"cache": cache})
+    server = ThreadingHTTPServer((host or Config.OPEN_API_HOST, port or Config.OPEN_API_PORT), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="open-slot-api", daemon=True).start()
+    log.info(f"Open-slot API op http://{server.server_address[0]}:{server.server_address[1]}/open")
+    return server
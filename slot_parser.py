@@ -0,0 +1,116 @@
+# slot_parser.py
+"""
+Pure parsing van de slottabel (zonder browser), gedeeld door de monitor en de benchmarks.
+
+Een 'dag' is (label_txt, full_date, [hh:mm, ...]):
+- label_txt: tekst van MainContent_LabelDatum{i}, bv. "ma 20/10"
+- full_date: title van MainContent_rblTijdstip{i}, bv. "20/10/2026"
+- tijden: labels naast de radioknoppen
+"""
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import is_within_n_business_days
+
+Day = Tuple[str, str, Sequence[str]]
+
+WEEKDAY_PREFIXES = ("ma", "di", "wo", "do", "vr")
+WINDOW_BUSINESS_DAYS = 3
+
+_VOID_TAGS = {"br", "input", "img", "hr", "meta", "link", "wbr", "col"}
+
+
+def collect_open_slots(days: Iterable[Day], now: Optional[datetime] = None) -> List[Tuple[datetime, str]]:
+    """Return list[(start_dt, human_label)] binnen 3 werkdagen, weekdays only."""
+    out = []
+    now = now or datetime.now()
+
+    for label_txt, full_date, times in days:
+        label_txt = label_txt.strip()
+        if not label_txt:
+            continue
+        day_prefix = label_txt.split()[0].lower()
+        if day_prefix not in WEEKDAY_PREFIXES:
+            continue
+        if not full_date:
+            continue
+
+        for hhmm in times:
+            try:
+                hhmm = hhmm.strip()
+                dt = datetime.strptime(full_date + " " + hhmm, "%d/%m/%Y %H:%M")
+                if dt <= now:
+                    continue
+                if is_within_n_business_days(dt, WINDOW_BUSINESS_DAYS, now):
+                    out.append((dt, f"{full_date} {hhmm}"))
+            except Exception:
+                continue
+
+    out.sort(key=lambda x: x[0])
+    return out
+
+
+class _SlotTableParser(HTMLParser):
+    """Haalt dagen uit de HTML van de slottabel (bv. een snapshot uit snapshots.py)."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.labels: Dict[int, List[str]] = {}
+        self.dates: Dict[int, str] = {}
+        self.times: Dict[int, List[str]] = {}
+        self._capture: Optional[Tuple[str, int]] = None  # ("label"|"time", dagindex)
+        self._depth = 0
+
+    @staticmethod
+    def _day_index(value: str, prefix: str) -> Optional[int]:
+        if not value.startswith(prefix):
+            return None
+        digits = value[len(prefix):].split("_", 1)[0]
+        return int(digits) if digits.isdigit() else None
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if self._capture:
+            if tag not in _VOID_TAGS:
+                self._depth += 1
+            return
+        el_id = a.get("id") or ""
+        i = self._day_index(el_id, "MainContent_LabelDatum")
+        if i is not None:
+            self._capture, self._depth = ("label", i), 1
+            self.labels.setdefault(i, [])
+            return
+        i = self._day_index(el_id, "MainContent_rblTijdstip")
+        if i is not None and "_" not in el_id[len("MainContent_rblTijdstip"):]:
+            self.dates[i] = a.get("title") or ""
+            return
+        if tag == "label":
+            i = self._day_index(a.get("for") or "", "MainContent_rblTijdstip")
+            if i is not None:
+                self._capture, self._depth = ("time", i), 1
+                self.times.setdefault(i, []).append("")
+
+    def handle_endtag(self, tag):
+        if self._capture:
+            self._depth -= 1
+            if self._depth <= 0:
+                self._capture = None
+
+    def handle_data(self, data):
+        if not self._capture:
+            return
+        kind, i = self._capture
+        if kind == "label":
+            self.labels[i].append(data)
+        else:
+            self.times[i][-1] += data
+
+
+def days_from_html(html: str) -> List[Day]:
+    p = _SlotTableParser()
+    p.feed(html)
+    p.close()
+    return [
+        (" ".join(t.strip() for t in p.labels[i] if t.strip()), p.dates.get(i, ""), p.times.get(i, []))
+        for i in sorted(p.labels)
+    ]
@@ -0,0 +1,298 @@
+# snapshots.py
+"""
+Change-only snapshots van de slottabel (en volledige pagina bij fouten).
+
+- Content-addressed: objects/<sha256>.html.gz; identieke HTML wordt één keer bewaard.
+- Een snapshot wordt enkel genomen als de slottabel veranderd is t.o.v. de vorige.
+  Foutsnapshots (volledige pagina) zijn gededupliceerd en gelimiteerd tot één per
+  target per ERROR_MIN_INTERVAL, zodat een reeks fouten de slothistoriek niet verdringt.
+- index.jsonl houdt per snapshot (ts, kind, target, hash, size) bij; de map is een
+  ringbuffer: objecten + index blijven onder SNAPSHOT_MAX_MB. De index krijgt hooguit
+  INDEX_SHARE daarvan (oudste regels eraf), daarna gaan de oudste objecten weg,
+  foutsnapshots eerst.
+- Snapshots zijn herbruikbaar als fixtures (load_html) en doorzoekbaar (search).
+- Meerdere processen (sharding) delen één map: opslaan, ringbuffer en index-herschrijven
+  gebeuren onder een fcntl-lock op <map>/.lock (lezen onder een gedeelde lock).
+
+CLI:
+    python snapshots.py list [--target 8|morgen]
+    python snapshots.py search "13:30"
+    python snapshots.py show <hash-prefix>
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: enkel de lock binnen het proces
+    fcntl = None
+
+from config import Config
+
+log = logging.getLogger("AIBV_SNAP")
+
+KIND_SLOTS = "slots"
+KIND_ERROR = "error"
+
+ERROR_MIN_INTERVAL = 300.0  # sec; max. één foutsnapshot per target per 5 min
+INDEX_SHARE = 0.1  # deel van max_bytes voor index.jsonl
+
+
+class SnapshotRecorder:
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or Config.SNAPSHOT_DIR
+        self.max_bytes = max_bytes or int(Config.SNAPSHOT_MAX_MB * 1024 * 1024)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.index_path = os.path.join(self.root, "index.jsonl")
+        self.lock_path = os.path.join(self.root, ".lock")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._last_hash: Dict[str, str] = {}  # target -> hash van de laatste slotsnapshot
+        self._last_error: Dict[str, Tuple[str, float]] = {}  # target -> (hash, monotonic ts)
+        self.stored = 0
+        self.deduped = 0
+        self.skipped = 0
+        self.evicted = 0
+
+    @contextmanager
+    def _dir_lock(self, exclusive: bool = True):
+        """Lock over processen heen; niet nesten (flock per open bestand)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---- opslaan ----
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.html.gz")
+
+    def record(self, target: str, html: str, kind: str = KIND_SLOTS, meta: Optional[Dict] = None) -> Optional[str]:
+        """
+        Bewaar 'html' als snapshot. Slotsnapshots worden overgeslagen als ze gelijk
+        zijn aan de vorige voor deze target; foutsnapshots als ze gelijk zijn aan de
+        vorige fout of binnen ERROR_MIN_INTERVAL vallen. Retourneert de hash of None.
+        """
+        digest = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        with self._lock, self._dir_lock():
+            if kind == KIND_SLOTS:
+                if self._last_hash.get(target) == digest:
+                    self.skipped += 1
+                    return None
+                self._last_hash[target] = digest
+            else:
+                now = time.monotonic()
+                last = self._last_error.get(target)
+                if last and (last[0] == digest or now - last[1] < ERROR_MIN_INTERVAL):
+                    self.skipped += 1
+                    return None
+                self._last_error[target] = (digest, now)
+
+            path = self._object_path(digest)
+            if os.path.exists(path):
+                self.deduped += 1
+                os.utime(path)  # recent gebruikt → later uitzetten
+            else:
+                tmp = path + ".tmp"
+                with gzip.open(tmp, "wb", compresslevel=9) as f:
+                    f.write(html.encode("utf-8"))
+                os.replace(tmp, path)
+                self.stored += 1
+
+            entry = {
+                "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "kind": kind,
+                "target": target,
+                "hash": digest,
+                "size": os.path.getsize(path),
+            }
+            if meta:
+                entry["meta"] = meta
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+            self._enforce_cap()
+        return digest
+
+    def _index_size(self) -> int:
+        try:
+            return os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            return 0
+
+    def _objects(self) -> Dict[str, Tuple[float, int, str]]:
+        """hash -> (mtime, size, bestandsnaam)"""
+        objs = {}
+        for name in os.listdir(self.objects_dir):
+            try:
+                st = os.stat(os.path.join(self.objects_dir, name))
+            except FileNotFoundError:
+                continue
+            objs[name.split(".", 1)[0]] = (st.st_mtime, st.st_size, name)
+        return objs
+
+    def _enforce_cap(self):
+        """Ringbuffer: index en objecten samen onder max_bytes."""
+        objs = self._objects()
+        entries = None
+
+        index_budget = int(self.max_bytes * INDEX_SHARE)
+        if self._index_size() > index_budget:
+            # oudste regels eraf, foutregels eerst (tot de helft van het budget: niet bij
+            # elke record opnieuw herschrijven)
+            entries = self._read_index()
+            sizes = [len(json.dumps(e, ensure_ascii=False).encode("utf-8")) + 1 for e in entries]
+            total = sum(sizes)
+            drop = set()
+            for kind in (KIND_ERROR, KIND_SLOTS):
+                for i, e in enumerate(entries):
+                    if total <= index_budget // 2:
+                        break
+                    if e["kind"] == kind:
+                        drop.add(i)
+                        total -= sizes[i]
+            entries = [e for i, e in enumerate(entries) if i not in drop]
+            # objecten zonder indexregel zijn onvindbaar geworden → ook weg
+            referenced = {e["hash"] for e in entries}
+            self._remove_objects([h for h in objs if h not in referenced], objs)
+            self._write_index(entries)
+
+        total = sum(size for _, size, _ in objs.values()) + self._index_size()
+        if total <= self.max_bytes:
+            return
+
+        if entries is None:
+            entries = self._read_index()
+        slot_hashes = {e["hash"] for e in entries if e["kind"] == KIND_SLOTS}
+        # foutsnapshots eerst, daarna de oudste
+        order = sorted(objs, key=lambda h: (h in slot_hashes, objs[h][0]))
+        gone = []
+        for h in order:
+            if total <= self.max_bytes:
+                break
+            gone.append(h)
+            total -= objs[h][1]
+        self._remove_objects(gone, objs)
+        self._write_index([e for e in entries if e["hash"] not in set(gone)])
+
+    def _remove_objects(self, hashes: List[str], objs: Dict[str, Tuple[float, int, str]]):
+        for h in hashes:
+            try:
+                os.remove(os.path.join(self.objects_dir, objs.pop(h)[2]))
+            except FileNotFoundError:
+                pass
+            self.evicted += 1
+        gone = set(hashes)
+        for target, digest in list(self._last_hash.items()):
+            if digest in gone:
+                del self._last_hash[target]
+
+    def _write_index(self, entries: List[Dict]):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in entries:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.index_path)
+
+    # ---- lezen ----
+    def _read_index(self) -> List[Dict]:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def entries(self, target: Optional[str] = None, kind: Optional[str] = None) -> List[Dict]:
+        with self._dir_lock(exclusive=False):
+            index = self._read_index()
+        return [
+            e for e in index
+            if (target is None or e["target"] == target) and (kind is None or e["kind"] == kind)
+        ]
+
+    def resolve(self, prefix: str) -> Optional[str]:
+        for name in os.listdir(self.objects_dir):
+            if name.startswith(prefix) and name.endswith(".html.gz"):
+                return name.split(".", 1)[0]
+        return None
+
+    def load_html(self, digest: str) -> str:
+        """HTML van een snapshot, bv. als fixture voor offline parsing."""
+        with gzip.open(self._object_path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def search(self, needle: str, target: Optional[str] = None) -> Iterator[Dict]:
+        """Alle indexregels waarvan de HTML 'needle' bevat (elk object één keer gelezen)."""
+        hits: Dict[str, bool] = {}
+        for e in self.entries(target):
+            h = e["hash"]
+            if h not in hits:
+                try:
+                    hits[h] = needle in self.load_html(h)
+                except FileNotFoundError:
+                    hits[h] = False
+            if hits[h]:
+                yield e
+
+    def stats(self) -> Dict:
+        size = sum(s for _, s, _ in self._objects().values()) + self._index_size()
+        return {
+            "stored": self.stored,
+            "deduped": self.deduped,
+            "skipped_unchanged": self.skipped,
+            "evicted": self.evicted,
+            "disk_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def get_recorder() -> Optional[SnapshotRecorder]:
+    """Recorder volgens config, of None als SNAPSHOT_DIR leeg is (uitgeschakeld)."""
+    if not Config.SNAPSHOT_DIR:
+        return None
+    return SnapshotRecorder()
+
+
+def _main():
+    ap = argparse.ArgumentParser(description="Slottabel-snapshots bekijken")
+    ap.add_argument("--dir", default=Config.SNAPSHOT_DIR or "snapshots")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--target")
+    p_list.add_argument("--kind")
+    p_search = sub.add_parser("search")
+    p_search.add_argument("needle")
+    p_search.add_argument("--target")
+    p_show = sub.add_parser("show")
+    p_show.add_argument("hash")
+    args = ap.parse_args()
+
+    rec = SnapshotRecorder(args.dir)
+    if args.cmd == "list":
+        for e in rec.entries(args.target, args.kind):
+            print(f"{e['ts']}  {e['kind']:<5}  {e['target']:<16}  {e['hash'][:12]}  {e['size']}B")
+        print(rec.stats())
+    elif args.cmd == "search":
+        for e in rec.search(args.needle, args.target):
+            print(f"{e['ts']}  {e['kind']:<5}  {e['target']:<16}  {e['hash'][:12]}")
+    elif args.cmd == "show":
+        digest = rec.resolve(args.hash)
+        if not digest:
+            sys.exit(f"Geen snapshot voor '{args.hash}'")
+        print(rec.load_html(digest))
+
+
+if __name__ == "__main__":
+    _main()
@@ -2,7 +2,7 @@
 import logging
 import asyncio
 import time
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Set, Tuple, List
 
 from telegram import Update
 from telegram.ext import (
@@ -15,6 +15,10 @@ from selenium.common.exceptions import TimeoutException
 
 from config import Config
 from selenium_monitor import AIBVMonitorBot
+from sharding import ShardSupervisor, build_targets
+from scheduler import get_scheduler
+from notifier import NotificationQueue, PRIO_ALERT, PRIO_STATUS
+from slot_cache import open_slots, start_api_server
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,40 +31,106 @@ HELP = (
     "Commands:\n"
     "/monitor <chassis> | <merk model> | <dd/mm/jjjj>\n"
     "   ➜ Logt in, opent flow, kiest station + week van morgen,\n"
-    "     en monitort continu tot /stop of 24u.\n\n"
+    "     en monitort continu tot /stop of 24u.\n"
+    "   ➜ Loopt er al een monitor? Dan wordt het voertuig\n"
+    "     toegevoegd aan dezelfde sessie (geen extra browser).\n\n"
     "/status  ➜ Tussentijdse status (aantal nieuwe slots).\n"
     "/stop    ➜ Stop monitoren & geef rapport.\n"
     "/report  ➜ Toon huidig rapport (tot nu toe).\n"
+    "/open    ➜ Slots die nu open staan (uit cache, geen extra poll).\n"
 )
 
 # Eén lopende monitoring per chat
 running_task: Optional[asyncio.Task] = None
+active_bot: Optional[AIBVMonitorBot] = None  # niet-sharded: bot van de lopende monitor
+active_supervisor: Optional[ShardSupervisor] = None  # sharded: lopende supervisor
+slot_vehicles: Dict[str, List[str]] = {}  # label -> chassis die wachtten bij detectie
 stop_flag = False
 results: List[Tuple[str, str]] = []  # (timestamp_seen, label)
 start_ts: Optional[float] = None
+worker_stats: Dict[int, Dict] = {}  # sharding: laatste scheduler-/watchdogstats per worker
+notifier: Optional[NotificationQueue] = None  # alle uitgaande berichten (zie post_init)
 
 
 def stop_requested() -> bool:
     return stop_flag
 
 
+async def reply(update: Update, text: str, priority: int = PRIO_STATUS):
+    """Antwoord via de uitgaande wachtrij i.p.v. een directe reply_text."""
+    notifier.enqueue(update.effective_chat.id, text, priority)
+
+
+def alert(chat_id: int, text: str):
+    """Nieuw-slot-melding: voorrang + bundeling; thread-safe (ook vanuit de Selenium-thread)."""
+    notifier.enqueue(chat_id, text, PRIO_ALERT, coalesce=True)
+
+
 async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("Monitor bot klaar ✅\n" + HELP)
+    await reply(update, "Monitor bot klaar ✅\n" + HELP)
 
 
 async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(HELP)
+    await reply(update, HELP)
 
 
 async def status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if start_ts is None:
-        return await update.message.reply_text("ℹ️ Er is geen actieve monitor.")
+        return await reply(update, "ℹ️ Er is geen actieve monitor.")
     elapsed = int(time.time() - start_ts)
     mins = elapsed // 60
-    await update.message.reply_text(
+    await reply(update,
         f"⏳ Monitor actief.\n"
         f"• Verstreken tijd: {mins} min\n"
-        f"• Nieuwe slots gedetecteerd: {len(results)}"
+        f"• Nieuwe slots gedetecteerd: {len(results)}\n"
+        + format_scheduler_stats()
+        + format_watchdog_stats()
+        + format_notifier_stats()
+    )
+
+
+def format_scheduler_stats() -> str:
+    if worker_stats:
+        stats = [w["scheduler"] for w in worker_stats.values()]
+    else:
+        stats = [get_scheduler().stats()]
+    # gedeelde scheduler (sharding): elke worker ziet dezelfde wachtrij en tellers
+    agg = max if any(s.get("shared") for s in stats) else sum
+    depth = agg(s["queue_depth"] for s in stats)
+    granted = agg(s["granted"] for s in stats)
+    avg = max(s["wait_avg_sec"] for s in stats)
+    p95 = max(s["wait_p95_sec"] for s in stats)
+    return (
+        f"• Budget: {Config.REQUEST_BUDGET_PER_MIN:g} req/min, {granted} polls uitgedeeld\n"
+        f"• Wachtrij: {depth}, wachttijd gem. {avg:.1f}s / p95 {p95:.1f}s"
+    )
+
+
+def format_watchdog_stats() -> str:
+    if worker_stats:
+        stats = [w["watchdog"] for w in worker_stats.values() if w.get("watchdog")]
+    else:
+        stats = [active_bot.watchdog.stats()] if active_bot else []
+    if not stats:
+        return ""
+    since = max(s["since_last_ok_sec"] for s in stats)
+    stalls = sum(s["stalls_total"] for s in stats)
+    restarts = sum(s["escalations"]["restart_driver"] for s in stats)
+    text = (
+        f"\n• Laatste geslaagde poll: {since:.0f}s geleden "
+        f"(max gat {max(s['max_gap_sec'] for s in stats):.0f}s)\n"
+        f"• Stalls: {stalls}, driver-herstarts: {restarts}"
+    )
+    if not all(s["healthy"] for s in stats):
+        text += "\n⚠️ Monitor lijkt vast te zitten — herstel loopt."
+    return text
+
+
+def format_notifier_stats() -> str:
+    st = notifier.stats()
+    return (
+        f"\n• Berichten: {st['sent_messages']} verzonden, {st['queued']} in wachtrij, "
+        f"latentie gem. {st['latency_avg_sec']:.1f}s / p95 {st['latency_p95_sec']:.1f}s"
     )
 
 
@@ -69,35 +139,53 @@ def format_report() -> str:
         return "📊 Rapport: (geen nieuwe slots gedetecteerd)"
     lines = ["📊 Rapport – nieuw verschenen slots:"]
     for ts, label in results:
-        lines.append(f"• [{ts}] {label}")
+        vehicles = slot_vehicles.get(label)
+        lines.append(f"• [{ts}] {label}" + (f" → {', '.join(vehicles)}" if vehicles else ""))
     return "\n".join(lines)
 
 
 async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(format_report())
+    await reply(update, format_report())
+
+
+def format_open_slots() -> str:
+    snap = open_slots.snapshot()
+    if not snap["targets"]:
+        return "ℹ️ Geen open slots bekend (draait er een monitor?)."
+    lines = [f"📅 Nu open (v{snap['version']}):"]
+    now = time.time()
+    for key, entry in sorted(snap["targets"].items()):
+        station, week = key.split("|", 1)
+        age = int(now - entry["checked_at"])
+        lines.append(f"\nStation {station}, week {week} (gecontroleerd {age}s geleden):")
+        if entry["slots"]:
+            lines.extend(f"• {label}" for label in entry["slots"])
+        else:
+            lines.append("• (geen)")
+    return "\n".join(lines)
+
+
+async def open_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await reply(update, format_open_slots())
 
 
 async def stop_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global stop_flag, running_task
     stop_flag = True
     if running_task and not running_task.done():
-        await update.message.reply_text("⏹️ Stopverzoek ontvangen. Ik rond netjes af…")
+        await reply(update, "⏹️ Stopverzoek ontvangen. Ik rond netjes af…")
     else:
-        await update.message.reply_text("ℹ️ Er draait momenteel geen actieve monitor.")
+        await reply(update, "ℹ️ Er draait momenteel geen actieve monitor.")
 
 
 async def unknown_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    await reply(update,
         "❓ Onbekende tekst.\nGebruik het juiste formaat:\n\n" + HELP
     )
 
 
 async def monitor_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global running_task, stop_flag, results, start_ts
-    stop_flag = False
-    results = []
-    start_ts = None
-
     if not update.message or not update.message.text:
         return
 
@@ -105,16 +193,30 @@ async def monitor_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         parts = update.message.text.split(" ", 1)
         if len(parts) != 2:
-            return await update.message.reply_text("❌ Ongeldig formaat.\n\n" + HELP)
+            return await reply(update, "❌ Ongeldig formaat.\n\n" + HELP)
         rest = parts[1]
         fields = [p.strip() for p in rest.split("|")]
         if len(fields) != 3:
-            return await update.message.reply_text("❌ Ongeldig formaat.\n\n" + HELP)
+            return await reply(update, "❌ Ongeldig formaat.\n\n" + HELP)
         chassis, merkmodel, datum = fields
     except Exception:
-        return await update.message.reply_text("❌ Kon argumenten niet parsen.\n\n" + HELP)
+        return await reply(update, "❌ Kon argumenten niet parsen.\n\n" + HELP)
+
+    # Lopende monitor → voertuig aan dezelfde sessie toevoegen
+    if running_task and not running_task.done():
+        return await add_vehicle_to_running(update, chassis, merkmodel, datum)
 
-    await update.message.reply_text(
+    stop_flag = False
+    results = []
+    start_ts = None
+    worker_stats.clear()
+    slot_vehicles.clear()
+
+    if Config.SHARD_WORKERS > 0:
+        running_task = asyncio.create_task(sharded_runner(update, chassis, merkmodel, datum))
+        return
+
+    await reply(update,
         "🚀 Monitor gestart voor **week van morgen**.\n"
         "• Weekends worden overgeslagen\n"
         "• Alleen slots binnen 3 werkdagen\n"
@@ -123,93 +225,207 @@ async def monitor_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
     async def runner():
-        global results, start_ts
+        global results, start_ts, active_bot
 
-        bot = AIBVMonitorBot()
+        bot = active_bot = AIBVMonitorBot()
 
+        def open_flow():
+            bot.login()
+            bot.add_vehicle(chassis, merkmodel, datum)
+            bot.select_eu_vehicle()
+            bot.select_station()
+
+        # Blokkerende Selenium-stappen in een thread: de event loop (en dus de
+        # uitgaande berichtenwachtrij) blijft vrij, statusberichten gaan meteen weg.
         try:
             # DRIVER
             try:
-                bot.setup_driver()
+                await asyncio.to_thread(bot.setup_driver)
             except Exception as e:
-                await update.message.reply_text(f"❌ Fout bij starten van de browser: {e}")
+                await reply(update, f"❌ Fout bij starten van de browser: {e}")
                 return
 
-            await update.message.reply_text("🔐 Inloggen en flow openen…")
+            await reply(update, "🔐 Inloggen en flow openen…")
             try:
-                bot.login()
-                bot.add_vehicle(chassis, merkmodel, datum)
-                bot.select_eu_vehicle()
-                bot.select_station()
+                await asyncio.to_thread(open_flow)
             except TimeoutException as e:
                 # ⬇️ Voeg context toe (URL + TITLE) voor duidelijke diagnose
-                await update.message.reply_text(
+                await reply(update,
                     "❌ Timeout tijdens inloggen/flow:\n"
                     f"{e}\n"
-                    f"{bot._dbg_context()}"
+                    f"{await asyncio.to_thread(bot._dbg_context)}"
                 )
                 return
             except Exception as e:
-                await update.message.reply_text(
+                await reply(update,
                     "❌ Fout tijdens inloggen/flow:\n"
                     f"{e}\n"
-                    f"{bot._dbg_context()}"
+                    f"{await asyncio.to_thread(bot._dbg_context)}"
                 )
                 return
 
             # Week van morgen zetten
-            ok = bot.select_week_of_tomorrow()
+            ok = await asyncio.to_thread(bot.select_week_of_tomorrow)
             if not ok:
-                await update.message.reply_text(
+                await reply(update,
                     "❌ Kon 'week van morgen' niet selecteren in dropdown.\n"
-                    f"{bot._dbg_context()}"
+                    f"{await asyncio.to_thread(bot._dbg_context)}"
                 )
                 return
 
-            await update.message.reply_text("🔎 Monitoren gestart… (ik meld alleen als er iets nieuws is) ")
+            await reply(update, "🔎 Monitoren gestart… (ik meld alleen als er iets nieuws is) ")
             start_ts = time.time()
 
             # Run monitoring in thread (blokkerend Selenium)
+            chat_id = update.effective_chat.id
             result = await asyncio.to_thread(
                 bot.monitor_slots,
                 stop_requested,
                 24 * 3600,
-                None  # geen 5-min status push
+                None,  # geen 5-min status push
+                lambda ts, label: on_slot(chat_id, label, bot.waiting_chassis()),
             )
 
             # Klaar -> bundel rapport
             if result.get("success"):
                 results = result.get("new_slots", [])
                 if result.get("stopped"):
-                    await update.message.reply_text("🛑 Gestopt op jouw verzoek.\n\n" + format_report())
+                    await reply(update, "🛑 Gestopt op jouw verzoek.\n\n" + format_report())
                 elif result.get("timeout"):
-                    await update.message.reply_text("⏲️ 24u afgelopen.\n\n" + format_report())
+                    await reply(update, "⏲️ 24u afgelopen.\n\n" + format_report())
                 else:
-                    await update.message.reply_text("✅ Monitor klaar.\n\n" + format_report())
+                    await reply(update, "✅ Monitor klaar.\n\n" + format_report())
             else:
-                await update.message.reply_text(f"❌ Monitor fout: {result.get('error','Onbekend')}")
+                await reply(update, f"❌ Monitor fout: {result.get('error','Onbekend')}")
 
         except Exception as e:
             log.exception("monitor runner error")
             # ⬇️ Context ook hier, voor safety
             try:
-                ctx = bot._dbg_context()
+                ctx = await asyncio.to_thread(bot._dbg_context)
             except Exception:
                 ctx = "(geen context beschikbaar)"
-            await update.message.reply_text(f"❌ Onverwachte fout: {e}\n{ctx}")
+            await reply(update, f"❌ Onverwachte fout: {e}\n{ctx}")
 
         finally:
-            bot.close()
+            active_bot = None
+            open_slots.remove(bot.target_key)
+            await asyncio.to_thread(bot.close)
 
     # Start de taak
     running_task = asyncio.create_task(runner())
 
 
+def on_slot(chat_id: int, label: str, vehicles: List[str]):
+    """Detectie toewijzen aan alle wachtende voertuigen en melden."""
+    slot_vehicles[label] = list(vehicles)
+    alert(chat_id, f"🆕 Nieuw slot: {label} → {', '.join(vehicles)}")
+
+
+async def add_vehicle_to_running(update: Update, chassis: str, merkmodel: str, datum: str):
+    if active_supervisor is not None:
+        added = await asyncio.to_thread(
+            active_supervisor.add_targets, build_targets(chassis, merkmodel, datum)
+        ) > 0
+    elif active_bot is not None:
+        added = active_bot.register_vehicle(chassis, merkmodel, datum)
+    else:
+        return await reply(update, "⏳ De monitor start nog op; probeer zo meteen opnieuw.")
+    if added:
+        await reply(update, f"🚗 Voertuig {chassis} toegevoegd aan de lopende monitor (zelfde sessie).")
+    else:
+        await reply(update, f"ℹ️ Voertuig {chassis} wordt al gemonitord.")
+
+
+async def sharded_runner(update: Update, chassis: str, merkmodel: str, datum: str):
+    """Zelfde monitor, maar verdeeld over SHARD_WORKERS processen (station x week)."""
+    global results, start_ts, active_supervisor
+
+    targets = build_targets(chassis, merkmodel, datum)
+    sup = ShardSupervisor()
+    seen_slots: Set[Tuple[str, str]] = set()  # (target_key, label) al gemeld in deze run
+    rotation = ""
+    if len(targets) > sup.workers:
+        rotation = (
+            f"\n⚠️ Meer targets dan workers: targets wisselen elkaar af "
+            f"(elke {Config.SHARD_SLICE_SEC // 60} min), dus niet elke target wordt continu gepolld."
+        )
+        log.warning(f"{len(targets)} targets > {sup.workers} workers → rotatie per {Config.SHARD_SLICE_SEC}s")
+    await reply(update,
+        f"🚀 Sharded monitor gestart: {len(targets)} target(s) over {sup.workers} worker(s).\n"
+        "• Weekends worden overgeslagen\n"
+        "• Alleen slots binnen 3 werkdagen\n"
+        "• Max duur: 24u of tot /stop"
+        + rotation
+    )
+
+    try:
+        sup.store.clear()
+        sup.add_targets(targets)
+        active_supervisor = sup
+        await asyncio.to_thread(sup.start)
+        start_ts = time.time()
+
+        while not stop_flag and time.time() - start_ts < 24 * 3600:
+            for kind, worker_id, key, payload in await asyncio.to_thread(sup.drain_events, 1.0):
+                station, week = key.split("|", 1)
+                if kind == "slot":
+                    ts, label = payload
+                    # na rotatie/overname begint een nieuwe bot met een lege 'seen':
+                    # slots die al gemeld waren niet opnieuw melden
+                    if (key, label) in seen_slots:
+                        continue
+                    seen_slots.add((key, label))
+                    label = f"{label} (station {station})"
+                    results.append((ts, label))
+                    on_slot(update.effective_chat.id, label, sup.store.waiters(key))
+                elif kind == "open":
+                    open_slots.update(key, payload)
+                elif kind == "released":
+                    open_slots.remove(key)
+                elif kind == "stats":
+                    worker_stats[worker_id] = payload
+                elif kind == "error":
+                    await reply(update,
+                        f"⚠️ Worker {worker_id} fout op station {station}, week {week}:\n{payload}"
+                    )
+            sup.check_workers()
+
+        if stop_flag:
+            await reply(update, "🛑 Gestopt op jouw verzoek.\n\n" + format_report())
+        else:
+            await reply(update, "⏲️ 24u afgelopen.\n\n" + format_report())
+
+    except Exception as e:
+        log.exception("sharded runner error")
+        await reply(update, f"❌ Onverwachte fout (sharding): {e}")
+
+    finally:
+        active_supervisor = None
+        open_slots.clear()
+        await asyncio.to_thread(sup.stop)
+
+
+async def post_init(app):
+    global notifier
+    notifier = NotificationQueue(lambda chat_id, text: app.bot.send_message(chat_id, text))
+    notifier.start()
+    if Config.OPEN_API_PORT:
+        start_api_server()
+
+
+async def post_shutdown(app):
+    if notifier:
+        await notifier.stop()
+
+
 def main():
     app = (
         ApplicationBuilder()
         .token(Config.TELEGRAM_TOKEN)
         .rate_limiter(AIORateLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
@@ -219,6 +435,7 @@ def main():
     app.add_handler(CommandHandler("status", status_cmd))
     app.add_handler(CommandHandler("stop", stop_cmd))
     app.add_handler(CommandHandler("report", report_cmd))
+    app.add_handler(CommandHandler("open", open_cmd))
 
     # Onbekende tekst -> help
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, unknown_message))